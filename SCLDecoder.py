@@ -1,9 +1,21 @@
 import numpy as np
-from typing import List, Tuple, Dict
-from crc import crc_remainder, crc_check
+from typing import List, Optional, Tuple, Sequence, Union
+from crc import crc_check_batch
+from drift_trellis import default_max_drift, trellis_llr
+from decoder_telemetry import DecoderTelemetry
+from encoder import polar_transform
+from polar_construction import frozen_set
+
+# Special nodes of the decoding tree decoded in closed form by Fast-SSC
+RATE_0 = 'rate0'            # All bits frozen
+RATE_1 = 'rate1'            # No bits frozen
+REPETITION = 'repetition'   # Only the last bit is an information bit
+SPC = 'spc'                 # Only the first bit is frozen (single parity check)
 
 class SCLDecoder:
-    def __init__(self, N: int, K: int, L: int, ps: float = 0.01, pi: float = 0.01, pd: float = 0.01):
+    def __init__(self, N: int, K: int, L: int, ps: float = 0.01, pi: float = 0.01, pd: float = 0.01, D: int = None, crc_polynomial=None,
+                 construction: str = 'bhattacharyya', B: Sequence[int] = None, frozen_bits=None, fast_ssc: bool = True,
+                 beam: float = None, initial_L: int = None, dtype=np.float32):
         """
         Initialize the SCL decoder.
         
@@ -14,6 +26,28 @@ class SCLDecoder:
         ps (float): Probability of substitution
         pi (float): Probability of insertion
         pd (float): Probability of deletion
+        D (int): Maximum absolute drift of the channel trellis (default:
+        drift_trellis.default_max_drift, which holds the drift after N bits
+        with probability 1 - 1e-6)
+        crc_polynomial: CRC generator (bit string or int) whose remainder fills
+        the last information bits; when given, the most probable path that
+        passes the CRC is returned
+        construction (str): Method of polar_construction used to pick the
+        frozen bits ('bhattacharyya', 'ga' or 'monte_carlo'); the result is
+        cached on disk
+        B (list): Codeword positions flipped for GC balance; their channel
+        LLRs are erased and the construction accounts for that
+        frozen_bits: Explicit frozen positions, overriding the construction
+        fast_ssc (bool): Decode Rate-0, Rate-1, repetition and SPC subtrees in
+        closed form; False walks every leaf bit by bit (the reference decoder)
+        beam (float): Prune channel trellis drift states more than beam nats
+        below the best state of their position (see
+        drift_trellis.beam_trellis_llr); approximate, and only faster than
+        the exact trellis for D well above the default. None evaluates every
+        drift state
+        initial_L (int): With a CRC, decode with this list size first and
+        double it for the frames that fail the CRC, up to L; None always uses L
+        dtype: Floating-point type of the LLRs kept per path
         """
         self.N = N
         self.K = K
@@ -21,18 +55,178 @@ class SCLDecoder:
         self.ps = ps
         self.pi = pi
         self.pd = pd
+        self.D = default_max_drift(N, pi, pd) if D is None else D
+        self.beam = beam
+        self.beam_stats = {}
+        self.crc_polynomial = crc_polynomial
+        self.initial_L = initial_L
+        self.dtype = np.dtype(dtype)
         
-        # Initialize paths
-        self.paths = [{'bits': np.zeros(N, dtype=int), 'prob': 1.0, 'drift': np.zeros(N, dtype=int)} for _ in range(L)]
+        self.n = int(np.log2(N))
         
-        # Initialize LLR storage
-        self.llr = np.zeros((self.N // 2 + 1, N, L))
+        # Frozen bit positions and the information positions that carry the message
+        self.B = np.asarray([] if B is None else B, dtype=int)
+        if frozen_bits is None:
+            frozen_bits = frozen_set(N, K, pi, pd, ps, self.B, method=construction)
+        self.frozen_bits = set(int(i) for i in frozen_bits)
+        self.info_positions = np.setdiff1d(np.arange(N), sorted(self.frozen_bits))
+        if len(self.info_positions) != K:
+            raise ValueError("The frozen bits must leave exactly K information positions.")
         
-        # Generate frozen bit positions (simplified)
-        self.frozen_bits = set(range(K, N))
+        # Decoding schedule of special nodes, classified once from the frozen set
+        self.fast_ssc = fast_ssc
+        frozen = np.zeros(N, dtype=bool)
+        frozen[sorted(self.frozen_bits)] = True
+        self.nodes = self.special_nodes(frozen, 0, 0)
         
         # Current bit being decoded
         self.current_bit = 0
+        
+        # Path memory per list size, allocated by the first decoding, see init_paths
+        self.pools = {}
+        
+        # Instrumentation, see enable_telemetry
+        self.telemetry = None
+
+    def special_nodes(self, frozen: np.ndarray, level: int, start: int) -> List[Tuple[str, int, int]]:
+        """
+        Split a subtree into special nodes in decoding order.
+        
+        Args:
+        frozen (np.ndarray): Frozen mask of all N bits
+        level (int): Level of the subtree root (0 for the whole tree)
+        start (int): First bit of the subtree
+        
+        Returns:
+        list: (kind, level, first bit) of every special node
+        """
+        node = frozen[start:start + (self.N >> level)]
+        if node.all():
+            return [(RATE_0, level, start)]
+        if not node.any():
+            return [(RATE_1, level, start)]
+        if node[:-1].all():
+            return [(REPETITION, level, start)]
+        if node[0] and not node[1:].any():
+            return [(SPC, level, start)]
+        half = len(node) // 2
+        return self.special_nodes(frozen, level + 1, start) + self.special_nodes(frozen, level + 1, start + half)
+
+    def init_paths(self, frames: int):
+        """
+        Set up the path memory pool for a batch of frames.
+        
+        Path l of frame f has the path metric path_metrics[f, l], the negative
+        log-probability of its decisions. Only path 0 starts active; the
+        others have an infinite metric until the list fills up.
+        
+        Stage s of the decoding tree keeps L slots of LLRs and partial sums of
+        the active node at depth s (length N / 2^s), and the pointer tables
+        llr_slots[s] and sum_slots[s] (frames, L) give the slot that every path
+        uses. Cloning a path only copies its pointers, so clones share their
+        slots until they write a stage. Every path writes its own slot, which
+        also recycles the slots of pruned paths. Decisions are stored per bit
+        with the parent of every path per decoding step (a bit, or a special
+        node with Fast-SSC), and traced back once at the end.
+        The arrays are kept per list size and reused, as views of their first
+        rows, for later batches of at most as many frames.
+        
+        Args:
+        frames (int): Number of frames decoded together
+        """
+        shape = (frames, self.L)
+        self.path_metrics = np.full(shape, np.inf)
+        self.path_metrics[:, 0] = 0.0
+        self.identity = np.broadcast_to(np.arange(self.L), shape)
+        self.frame_index = np.arange(frames)[:, None]
+        self.llr_slots = np.zeros((self.n + 1,) + shape, dtype=np.intp)
+        self.sum_slots = np.zeros((self.n,) + shape, dtype=np.intp)
+        
+        pool = self.pools.get(self.L)
+        if pool is None or pool['capacity'] < frames:
+            pool = self.pools[self.L] = self.allocate_pool(frames)
+        for name in ('llr', 'partial_sums'):
+            setattr(self, name, [stage[:frames] for stage in pool[name]])
+        self.scratch, self.sum_scratch, self.temp = pool['scratch'], pool['sum_scratch'], pool['temp']
+        self.decisions = pool['decisions'][:frames]
+        self.parents = pool['parents'][:, :frames]
+        self.bits = pool['bits'][:frames]
+
+    def pool_layout(self, frames: int, L: Optional[int] = None) -> dict:
+        """
+        Shape and dtype of every array of the path memory for frames frames.
+        
+        Every path holds about N LLRs in the decoder dtype plus N / 2 each of
+        gather and f scratch space, 3N bits of partial sums and scratch and,
+        per bit, its decision and the index of its parent (in the smallest
+        type that fits L). At N = 4096 and L = 32 the pool of one frame is
+        1.9 MB. The channel trellis that runs first adds up to
+        drift_trellis.TRELLIS_MEMORY per chunk of frames, 3.3 MB for one
+        frame there, so a decode() with the pool already allocated peaks at
+        about 5.2 MB.
+        
+        Args:
+        frames (int): Number of frames
+        L (int): List size (default: the current L)
+        
+        Returns:
+        dict: (shape, dtype) of every entry of allocate_pool, a list of them
+        per stage for the staged entries
+        """
+        L = self.L if L is None else L
+        shape = (frames, L)
+        
+        # LLR storage: stage s holds the LLRs of the active node at depth s
+        # of the decoding tree; stage 0 holds the channel LLRs, shared by all paths
+        layout = {'llr': [((frames, 1, self.N), self.dtype)] + [(shape + (self.N >> s,), self.dtype) for s in range(1, self.n + 1)]}
+        
+        # Partial sums: stage s holds the re-encoded bits of the decoded
+        # children of the active node at depth s
+        layout['partial_sums'] = [(shape + (self.N >> s,), np.dtype(bool)) for s in range(self.n)]
+        
+        # Scratch space for gathered parent nodes and f intermediates. Only
+        # one node is computed at a time, so every stage uses the start of one
+        # flat buffer sized for the largest: LLRs are gathered from stages 1
+        # and below (stage 0 is shared) and f writes levels 1 and below
+        half = frames * L * max(self.N >> 1, 1)
+        layout['scratch'] = ((half,), self.dtype)
+        layout['temp'] = ((half,), self.dtype)
+        layout['sum_scratch'] = ((frames * L * self.N,), np.dtype(bool))
+        
+        # Decision and parent path of every path at every bit
+        layout['decisions'] = (shape + (self.N,), np.dtype(bool))
+        layout['parents'] = ((self.N,) + shape, np.min_scalar_type(L - 1))
+        layout['bits'] = (shape + (self.N,), np.dtype(np.uint8))
+        return layout
+
+    def allocate_pool(self, frames: int) -> dict:
+        """Allocate the path memory of init_paths for up to frames frames and the current L, see pool_layout."""
+        pool = {'capacity': frames}
+        for name, spec in self.pool_layout(frames).items():
+            pool[name] = [np.zeros(*stage) for stage in spec] if isinstance(spec, list) else np.zeros(*spec)
+        return pool
+
+    def path_memory(self, frames: int) -> int:
+        """
+        Bytes of path memory the decoder keeps to decode frames frames at once.
+        
+        Pools are kept per list size, so with initial_L the pools of every list
+        size up to L count. The pointer tables and metrics that init_paths
+        builds per batch are included; all of it is proportional to frames.
+        """
+        sizes = [self.L]
+        if self.initial_L is not None and self.crc_polynomial is not None:
+            sizes = [min(self.initial_L, self.L)]
+            while sizes[-1] < self.L:
+                sizes.append(min(2 * sizes[-1], self.L))
+        
+        total = 0
+        for L in sizes:
+            for spec in self.pool_layout(frames, L).values():
+                total += sum(int(np.prod(shape)) * dtype.itemsize for shape, dtype in (spec if isinstance(spec, list) else [spec]))
+        
+        # path_metrics, llr_slots and sum_slots of init_paths, for the largest list
+        return total + frames * self.L * (8 + (2 * self.n + 1) * np.dtype(np.intp).itemsize)
 
     def f_function(self, a: float, b: float) -> float:
         """f function for LLR calculation."""
@@ -42,121 +236,509 @@ class SCLDecoder:
         """g function for LLR calculation."""
         return b + (1 - 2 * u) * a
 
-    def channel_llr(self, y: np.ndarray, d: int, i: int) -> float:
+    def stack_received(self, received: Union[np.ndarray, Sequence[np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calculate channel LLR for IDS channel.
+        Stack received sequences of possibly different lengths.
+        
+        Args:
+        received: 2-D array with one sequence per row, or a sequence of 1-D arrays
+        
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: Zero-padded sequences (frames, max length)
+        and the length of every sequence
+        """
+        if isinstance(received, np.ndarray) and received.ndim == 2:
+            return received.astype(int), np.full(len(received), received.shape[1])
+        
+        lengths = np.array([len(y) for y in received], dtype=int)
+        y = np.zeros((len(received), max(lengths.max(initial=0), 1)), dtype=int)
+        for f, sequence in enumerate(received):
+            y[f, :lengths[f]] = sequence
+        return y, lengths
+
+    def channel_llr(self, y: np.ndarray, lengths: np.ndarray, erased: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calculate channel LLRs for IDS channel.
+        
+        The LLRs are marginalized over the drift with the forward-backward
+        trellis of drift_trellis. The most likely drift after every bit is
+        kept in self.drift and, with a beam, the pruning statistics in
+        self.beam_stats. LLRs of the positions of B are erased in the frames
+        selected by erased.
+        
+        Args:
+        y (np.ndarray): Zero-padded received sequences (frames, max length)
+        lengths (np.ndarray): Length of every received sequence (frames,)
+        erased (np.ndarray): Frames whose positions of B are erased (default: all)
+        
+        Returns:
+        np.ndarray: Channel LLRs of all N bits (frames, N)
+        """
+        llr, self.drift = trellis_llr(y, lengths, self.N, self.pi, self.pd, self.ps, self.D, self.beam, self.beam_stats)
+        if erased is None:
+            llr[:, self.B] = 0
+        else:
+            llr[np.ix_(np.asarray(erased, dtype=bool), self.B)] = 0
+        return llr
+
+    def cluster_llr(self, clusters: Sequence[Sequence[np.ndarray]]) -> np.ndarray:
+        """
+        Calculate joint channel LLRs of clusters of reads of the same strands.
+        
+        The reads of all clusters run through the drift trellis in one batch,
+        each with its own alignment, and the LLRs of the reads of a cluster
+        are summed, as the reads are independent given the transmitted bits.
+        
+        Args:
+        clusters: One sequence of 1-D reads per strand
+        
+        Returns:
+        np.ndarray: Joint channel LLRs of all N bits (clusters, N)
+        """
+        sizes = np.array([len(reads) for reads in clusters], dtype=int)
+        if np.any(sizes == 0):
+            raise ValueError("Every cluster needs at least one read.")
+        y, lengths = self.stack_received([np.asarray(read) for reads in clusters for read in reads])
+        llr = self.channel_llr(y, lengths)
+        return np.add.reduceat(llr, np.cumsum(sizes) - sizes, axis=0)
+
+    def gather(self, stages: List[np.ndarray], slots: np.ndarray, s: int, scratch: np.ndarray) -> np.ndarray:
+        """
+        Read stage s of every path through its pointer table.
+        
+        Paths that own their slot are read in place; otherwise the slots are
+        gathered into the start of a preallocated flat scratch buffer, valid
+        until the next gather into it.
+        
+        Returns:
+        np.ndarray: Stage s of every path (frames, L, N / 2^s)
+        """
+        if s == 0 and stages is self.llr:
+            return stages[0]
+        if np.array_equal(slots[s], self.identity):
+            return stages[s]
+        frames = len(slots[s])
+        rows = (np.arange(frames)[:, None] * self.L + slots[s]).reshape(-1)
+        source = stages[s].reshape(frames * self.L, -1)
+        out = scratch[:source.size].reshape(source.shape)
+        return np.take(source, rows, axis=0, out=out).reshape(stages[s].shape)
+
+    def update_node(self, level: int, i: int):
+        """
+        Compute the LLRs of the node at the given level that contains bit i.
+        
+        The node is derived from its parent one stage up with the f function
+        if it is a left child and with the g function and the partial sums of
+        its decoded left sibling if it is a right child. Every path writes its
+        own slot of the stage, in place.
+        
+        Args:
+        level (int): Level of the node in the decoding tree (1 to n)
+        i (int): Bit index
+        """
+        length = self.N >> level
+        parent = self.gather(self.llr, self.llr_slots, level - 1, self.scratch)
+        a, b = parent[..., :length], parent[..., length:]
+        node = self.llr[level]
+        temp = self.temp[:node.size].reshape(node.shape)
+        
+        if (i >> (self.n - level)) & 1 == 0:
+            # f: sign(a) sign(b) min(|a|, |b|)
+            np.minimum(np.abs(a, out=temp), np.abs(b, out=node), out=node)
+            np.copysign(node, np.multiply(a, b, out=temp), out=node)
+        else:
+            # g: b + (1 - 2u) a with the partial sums u of the left sibling
+            u = self.gather(self.partial_sums, self.sum_slots, level - 1, self.sum_scratch)[..., :length]
+            np.copyto(node, a)
+            np.negative(node, out=node, where=u)
+            node += b
+        self.llr_slots[level] = self.identity
+
+    def calculate_llr(self, i: int) -> np.ndarray:
+        """
+        Calculate the LLR of bit i for every path, reusing the memoized stages.
+        
+        Only the nodes on the way from the root to leaf i that changed since
+        bit i - 1 are recomputed, so every f/g node is evaluated once per path.
         
         Args:
-        y (np.ndarray): Received sequence
-        d (int): Current drift value
         i (int): Bit index
         
         Returns:
-        float: Channel LLR
+        np.ndarray: Calculated LLRs (frames, paths)
+        """
+        # Nodes below the deepest common ancestor of bits i - 1 and i
+        trailing_zeros = (i & -i).bit_length() - 1 if i > 0 else self.n - 1
+        for level in range(self.n - trailing_zeros, self.n + 1):
+            self.update_node(level, i)
+        return self.llr[self.n][..., 0]
+
+    def calculate_node_llr(self, level: int, start: int) -> np.ndarray:
         """
-        if i + d >= len(y) or i + d < 0:
-            # If the bit is outside the received sequence due to drift,
-            # we return a neutral LLR (equal probability for 0 and 1)
-            return 0
+        Calculate the LLRs of the node at the given level that starts at bit start.
         
-        # Calculate LLR based on the channel model
-        p_y_given_x_0 = (1 - self.ps) if y[i + d] == 0 else self.ps
-        p_y_given_x_1 = (1 - self.ps) if y[i + d] == 1 else self.ps
+        Args:
+        level (int): Level of the node (0 to n)
+        start (int): First bit of the node
         
-        return np.log(p_y_given_x_0 / p_y_given_x_1)
+        Returns:
+        np.ndarray: LLRs of the node for every path (frames, L, N / 2^level)
+        """
+        trailing_zeros = (start & -start).bit_length() - 1 if start > 0 else self.n - 1
+        for parent_level in range(self.n - trailing_zeros, level + 1):
+            self.update_node(parent_level, start)
+        return np.broadcast_to(self.llr[level], self.path_metrics.shape + (self.N >> level,))
 
-    def calculate_llr(self, y: np.ndarray, d: int, level: int, i: int, path_index: int) -> float:
+    def update_partial_sums(self, i: int, bits: np.ndarray):
         """
-        Recursively calculate LLR.
+        Propagate decoded bit i of every path into the partial sums.
         
         Args:
-        y (np.ndarray): Received sequence
-        d (int): Current drift value
-        level (int): Current level in the decoding tree
         i (int): Bit index
-        path_index (int): Index of the current path
+        bits (np.ndarray): Decoded value of bit i for every path (frames, paths)
+        """
+        self.propagate_codeword(self.n, i, bits[..., None])
+
+    def propagate_codeword(self, level: int, start: int, codeword: np.ndarray):
+        """
+        Propagate the codeword of a decoded node into the partial sums.
+        
+        Args:
+        level (int): Level of the decoded node
+        start (int): First bit of the node
+        codeword (np.ndarray): Re-encoded bits of the node for every path (frames, L, N / 2^level)
+        """
+        i = start
+        for level in range(level, 0, -1):
+            length = self.N >> level
+            parent = self.partial_sums[level - 1]
+            if (i >> (self.n - level)) & 1 == 0:
+                # The left half of a node is written first; its right half is not read yet
+                parent[..., :length] = codeword
+                self.sum_slots[level - 1] = self.identity
+                break
+            left = self.gather(self.partial_sums, self.sum_slots, level - 1, self.sum_scratch)[..., :length]
+            np.logical_xor(left, codeword, out=parent[..., :length])
+            parent[..., length:] = codeword
+            self.sum_slots[level - 1] = self.identity
+            codeword = parent
+
+    def select_paths(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Select the most probable paths.
+        
+        Extending a path with bit u adds -log P(u | llr) = log(1 + exp(-(1 - 2u) llr))
+        to its metric, evaluated in the log domain so long codes do not
+        underflow. The L best of the 2L candidates are found with a partial
+        sort, so the cost only depends on the list size.
         
         Returns:
-        float: Calculated LLR
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Parent path index, decoded bit
+        and path metric of each of the L surviving paths (frames, L)
         """
-        if level == int(np.log2(self.N)):
-            return self.channel_llr(y, d, i)
+        llr = self.llr[self.n][..., 0]
+        return self.select_candidates(self.path_metrics + self.penalty(llr, 0), self.path_metrics + self.penalty(llr, 1))
+
+    def select_candidates(self, metrics_0: np.ndarray, metrics_1: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Keep the L best of the 2L extensions of the paths.
+        
+        Args:
+        metrics_0 (np.ndarray): Metric of extending every path one way (frames, L)
+        metrics_1 (np.ndarray): Metric of extending every path the other way (frames, L)
+        
+        Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Parent path index, chosen
+        extension (0 or 1) and path metric of each survivor (frames, L)
+        """
+        # Candidate 2l + u extends path l with choice u
+        candidates = np.stack([metrics_0, metrics_1], axis=-1).reshape(len(metrics_0), -1)
+        survivors = np.argpartition(candidates, self.L - 1, axis=1)[:, :self.L]
+        return survivors // 2, survivors % 2, np.take_along_axis(candidates, survivors, axis=1)
+
+    def penalty(self, llr: np.ndarray, u: int) -> np.ndarray:
+        """Path metric increase -log P(u | llr) of deciding bit value u."""
+        return np.logaddexp(0.0, -(1 - 2 * u) * llr)
+
+    def extend_paths(self, parents: np.ndarray, bits: np.ndarray, path_metrics: np.ndarray):
+        """
+        Extend the selected paths.
+        
+        Survivors take over the pointer tables of their parents, so no stage
+        is copied; the decision and the parent are recorded for the traceback.
+        
+        Args:
+        parents (np.ndarray): Parent path index of each survivor (frames, L)
+        bits (np.ndarray): Decoded bit of each survivor (frames, L)
+        path_metrics (np.ndarray): Path metric of each survivor (frames, L)
+        """
+        self.llr_slots = self.llr_slots[:, self.frame_index, parents]
+        self.sum_slots = self.sum_slots[:, self.frame_index, parents]
+        self.path_metrics = path_metrics
+        
+        i = self.current_bit
+        self.decisions[:, :, i] = bits
+        self.parents[i] = parents
+        self.update_partial_sums(i, self.decisions[:, :, i])
+
+    def decode_node(self, kind: str, level: int, start: int):
+        """
+        Decode a special node of every path in closed form.
+        
+        Rate-0 nodes are all zero and repetition nodes fork every path into
+        all-zero and all-one codewords. Rate-1 nodes take hard decisions and
+        fork min(L - 1, size) times, each time on the next least reliable
+        bit; SPC nodes first fix the parity with their least reliable bit and
+        then fork min(L - 1, size - 1) times on flipping one more bit together
+        with it. Metrics use the same log-domain penalties as bit decisions.
         
-        length = self.N // (2 ** level)
-        left_llr = self.calculate_llr(y, d, level + 1, 2 * i % self.N, path_index)
-        right_llr = self.calculate_llr(y, d, level + 1, (2 * i + 1) % self.N, path_index)
+        Args:
+        kind (str): RATE_0, RATE_1, REPETITION or SPC
+        level (int): Level of the node
+        start (int): First bit of the node
+        """
+        alpha = self.calculate_node_llr(level, start)
+        size = alpha.shape[-1]
+        parents = self.identity
         
-        if i % 2 == 0:
-            return self.f_function(left_llr, right_llr)
+        if kind == RATE_0:
+            self.path_metrics = self.path_metrics + np.logaddexp(0.0, -alpha).sum(axis=-1)
+            codeword = np.zeros(alpha.shape, dtype=bool)
+        elif kind == REPETITION:
+            parents, bits, self.path_metrics = self.select_candidates(self.path_metrics + np.logaddexp(0.0, -alpha).sum(axis=-1),
+                                                                      self.path_metrics + np.logaddexp(0.0, alpha).sum(axis=-1))
+            codeword = np.broadcast_to(bits[..., None].astype(bool), alpha.shape)
         else:
-            u_partial = self.paths[path_index]['bits'][(i - 1) % self.N]
-            return self.g_function(left_llr, right_llr, u_partial)
-
-    def select_paths(self) -> List[Tuple[Dict, int, float]]:
-        """Select the most probable paths."""
-        all_paths = []
-        for path_index, path in enumerate(self.paths):
-            llr = self.llr[0, self.current_bit, path_index]
-            prob_0 = path['prob'] * (1 / (1 + np.exp(-llr)))
-            prob_1 = path['prob'] * (1 / (1 + np.exp(llr)))
-            all_paths.append((path, 0, prob_0))
-            all_paths.append((path, 1, prob_1))
-        
-        all_paths.sort(key=lambda x: x[2], reverse=True)
-        return all_paths[:self.L]
-
-    def extend_paths(self, selected_paths: List[Tuple[Dict, int, float]]):
-        """Extend the selected paths."""
-        new_paths = []
-        for old_path, bit, prob in selected_paths:
-            new_path = {
-                'bits': old_path['bits'].copy(),
-                'prob': prob,
-                'drift': old_path['drift'].copy()
-            }
-            new_path['bits'][self.current_bit] = bit
+            hard = alpha < 0
+            magnitude = np.abs(alpha)
+            metrics = self.path_metrics + np.logaddexp(0.0, -magnitude).sum(axis=-1)
             
-            # Update drift based on the decoded bit
-            r = np.random.random()
-            if r < self.pi:
-                new_path['drift'][self.current_bit] = new_path['drift'][self.current_bit - 1] + 1
-            elif r < self.pi + self.pd:
-                new_path['drift'][self.current_bit] = new_path['drift'][self.current_bit - 1] - 1
-            else:
-                new_path['drift'][self.current_bit] = new_path['drift'][self.current_bit - 1]
+            # Least reliable positions of every path, most ambiguous first
+            spc = kind == SPC
+            forks = min(self.L - 1, size - spc)
+            count = forks + spc
+            least = np.argpartition(magnitude, count - 1, axis=-1)[..., :count] if count < size else np.broadcast_to(np.arange(size), alpha.shape)
+            least = np.take_along_axis(least, np.argsort(np.take_along_axis(magnitude, least, axis=-1), axis=-1), axis=-1)
+            reliability = np.take_along_axis(magnitude, least, axis=-1)
+            flipped = np.zeros(least.shape, dtype=bool)
+            if spc:
+                odd = hard.sum(axis=-1) % 2 == 1
+                flipped[..., 0] = odd
+                metrics = metrics + np.where(odd, reliability[..., 0], 0.0)
+            
+            for column in range(spc, count):
+                # Flipping a bit away from its hard decision costs its reliability
+                cost = np.where(flipped[..., column], -reliability[..., column], reliability[..., column])
+                if spc:
+                    cost = cost + np.where(flipped[..., 0], -reliability[..., 0], reliability[..., 0])
+                step, flip, metrics = self.select_candidates(metrics, metrics + cost)
+                parents = parents[self.frame_index, step]
+                least, reliability, flipped = (a[self.frame_index, step] for a in (least, reliability, flipped))
+                flipped[..., column] ^= flip.astype(bool)
+                if spc:
+                    flipped[..., 0] ^= flip.astype(bool)
             
-            new_paths.append(new_path)
-        self.paths = new_paths
+            self.path_metrics = metrics
+            codeword = hard[self.frame_index, parents]
+            np.put_along_axis(codeword, least, np.take_along_axis(codeword, least, axis=-1) ^ flipped, axis=-1)
+        
+        # Survivors take over the pointers of their ancestors before the partial sums are written
+        if parents is not self.identity:
+            self.llr_slots = self.llr_slots[:, self.frame_index, parents]
+            self.sum_slots = self.sum_slots[:, self.frame_index, parents]
+        self.parents[start] = parents
+        self.parents[start + 1:start + size] = self.identity
+        self.decisions[:, :, start:start + size] = polar_transform(codeword) if kind != RATE_0 else False
+        self.propagate_codeword(level, start, codeword)
 
-    def decode(self, y: np.ndarray) -> np.ndarray:
+    def traceback(self) -> np.ndarray:
         """
-        Main decoding function.
+        Collect the decoded bits of every surviving path from the decisions.
+        
+        Returns:
+        np.ndarray: Decoded bits of every path (frames, L, N)
+        """
+        paths = self.identity
+        for start, stop in reversed(self.steps):
+            self.bits[:, :, start:stop] = self.decisions[self.frame_index, paths, start:stop]
+            paths = self.parents[start][self.frame_index, paths]
+        return self.bits
+
+    def decode_llr_batch(self, channel_llr: np.ndarray) -> np.ndarray:
+        """
+        Decode a batch of frames from their channel LLRs.
+        
+        With initial_L and a CRC, all frames are first decoded with a list of
+        initial_L paths, and the frames whose paths all fail the CRC are
+        decoded again with twice as many paths, up to L. The list size that
+        decoded every frame is kept in self.list_sizes.
         
         Args:
-        y (np.ndarray): Received sequence
+        channel_llr (np.ndarray): Channel LLRs of the code bits (frames, N)
         
         Returns:
-        np.ndarray: Decoded message
+        np.ndarray: Decoded messages (frames, K)
+        """
+        channel_llr = np.asarray(channel_llr)
+        frames = len(channel_llr)
+        L = self.L
+        self.list_sizes = np.full(frames, L)
+        if self.initial_L is None or self.crc_polynomial is None:
+            self.batch_frames = np.arange(frames)
+            return self.decode_list_batch(channel_llr)
+        
+        decoded = np.zeros((frames, self.K), dtype=np.uint8)
+        crc_passed = np.zeros(frames, dtype=bool)
+        pending = np.arange(frames)
+        self.L = min(self.initial_L, L)
+        try:
+            while len(pending):
+                self.batch_frames = pending
+                decoded[pending] = self.decode_list_batch(channel_llr[pending])
+                crc_passed[pending] = self.crc_passed
+                self.list_sizes[pending] = self.L
+                if self.L == L:
+                    break
+                pending = pending[~self.crc_passed]
+                self.L = min(2 * self.L, L)
+        finally:
+            self.L = L
+        self.crc_passed = crc_passed
+        return decoded
+
+    def decode_list_batch(self, channel_llr: np.ndarray) -> np.ndarray:
         """
-        for i in range(self.N):
+        Decode a batch of frames from their channel LLRs with a list of L paths.
+        
+        A single loop over the special nodes (or the bit positions without
+        Fast-SSC) serves all frames; the LLR updates, path sorting and path
+        extension run on (frames, L, N) arrays.
+        
+        Args:
+        channel_llr (np.ndarray): Channel LLRs of the code bits (frames, N)
+        
+        Returns:
+        np.ndarray: Decoded messages (frames, K)
+        """
+        frames = len(channel_llr)
+        self.init_paths(frames)
+        self.llr[0][:, 0] = channel_llr
+        
+        if self.fast_ssc:
+            self.steps = [(start, start + (self.N >> level)) for _, level, start in self.nodes]
+        else:
+            self.steps = [(i, i + 1) for i in range(self.N)]
+        
+        for kind, level, start in self.nodes if self.fast_ssc else ():
+            self.decode_node(kind, level, start)
+        
+        for i in range(self.N) if not self.fast_ssc else ():
             self.current_bit = i
-            
-            for path_index, path in enumerate(self.paths):
-                current_drift = path['drift'][i - 1] if i > 0 else 0
-                self.llr[0, i, path_index] = self.calculate_llr(y, current_drift, 0, i, path_index)
+            self.calculate_llr(i)
             
             if i not in self.frozen_bits:
-                selected_paths = self.select_paths()
-                self.extend_paths(selected_paths)
+                self.extend_paths(*self.select_paths())
             else:
-                for path in self.paths:
-                    path['bits'][i] = 0
-                    path['drift'][i] = path['drift'][i - 1] if i > 0 else 0
+                self.path_metrics = self.path_metrics + self.penalty(self.llr[self.n][..., 0], 0)
+                self.decisions[:, :, i] = False
+                self.parents[i] = self.identity
+                self.update_partial_sums(i, self.decisions[:, :, i])
+        
+        candidates = self.traceback()[:, :, self.info_positions]
+        return candidates[np.arange(frames), self.best_paths(candidates)]
+
+    def best_paths(self, candidates: np.ndarray) -> np.ndarray:
+        """
+        Pick the decoded path of every frame.
+        
+        With a CRC, all surviving paths are checked at once and paths that
+        fail it are only kept when no path of the frame passes; the most
+        probable remaining path wins.
+        
+        Args:
+        candidates (np.ndarray): Information bits of every path (frames, L, K)
+        
+        Returns:
+        np.ndarray: Index of the chosen path of every frame (frames,)
+        """
+        if self.crc_polynomial is not None:
+            passed = crc_check_batch(candidates, self.crc_polynomial)
+            self.crc_passed = passed.any(axis=1)
+            passed |= ~self.crc_passed[:, None]
+            return np.argmin(np.where(passed, self.path_metrics, np.inf), axis=1)
+        self.crc_passed = np.ones(len(candidates), dtype=bool)
+        return np.argmin(self.path_metrics, axis=1)
+
+    def enable_telemetry(self, telemetry: DecoderTelemetry = None) -> DecoderTelemetry:
+        """
+        Start recording phase timings, f/g counts, path losses and drift histograms.
+        
+        The telemetry wraps the methods of this decoder instance only while it
+        is enabled, so a decoder without telemetry runs the plain methods.
+        
+        Args:
+        telemetry (DecoderTelemetry): Recorder to add to (default: a new one)
         
-        best_path = max(self.paths, key=lambda x: x['prob'])
-        decoded_bits = best_path['bits'][:self.K]
+        Returns:
+        DecoderTelemetry: The active recorder
+        """
+        self.disable_telemetry()
+        self.telemetry = DecoderTelemetry() if telemetry is None else telemetry
+        self.telemetry.attach(self)
+        return self.telemetry
+
+    def disable_telemetry(self):
+        """Stop recording; the recorded telemetry stays readable."""
+        if self.telemetry is not None:
+            self.telemetry.detach(self)
+            self.telemetry = None
+
+    def decode_batch(self, received: Union[np.ndarray, Sequence[np.ndarray]]) -> np.ndarray:
+        """
+        Decode a batch of received sequences together.
         
-        # Perform CRC check if needed
-        # crc_check(decoded_bits, polynomial_bitstring, check_value)
+        Args:
+        received: 2-D array with one received sequence per row, or a sequence
+        of 1-D received sequences of possibly different lengths
         
-        return decoded_bits
+        Returns:
+        np.ndarray: Decoded messages (frames, K)
+        """
+        y, lengths = self.stack_received(received)
+        return self.decode_llr_batch(self.channel_llr(y, lengths))
+
+    def decode(self, y: np.ndarray) -> np.ndarray:
+        """
+        Main decoding function.
+        
+        Args:
+        y (np.ndarray): Received sequence
+        
+        Returns:
+        np.ndarray: Decoded message
+        """
+        return self.decode_batch([np.asarray(y)])[0]
+
+    def decode_clusters(self, clusters: Sequence[Sequence[np.ndarray]]) -> np.ndarray:
+        """
+        Decode a batch of strands, each from a cluster of its reads.
+        
+        Args:
+        clusters: One sequence of 1-D reads per strand
+        
+        Returns:
+        np.ndarray: Decoded messages (clusters, K)
+        """
+        return self.decode_llr_batch(self.cluster_llr(clusters))
+
+    def decode_cluster(self, reads: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Decode one strand from several noisy reads of it.
+        
+        Args:
+        reads: Received sequences of the same codeword
+        
+        Returns:
+        np.ndarray: Decoded message
+        """
+        return self.decode_clusters([reads])[0]
@@ -0,0 +1,225 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+from SCLDecoder import SCLDecoder
+from crc import CRC8_POLYNOMIAL, crc_check_batch, crc_compute, crc_remainder
+from dna_error_simulation import introduce_indel_errors
+from dna_sequence_generator_and_binary_converter import generate_random_dna_sequence
+from encoder import find_balanced_vector, find_balanced_vectors, polar_code_encoding, polar_transform
+from ids_symmetric_capacity_estimator import IDSChannel
+
+# Default benchmark grid
+CODE_LENGTHS = [64, 256, 1024, 4096]
+LIST_SIZES = [1, 2, 4, 8, 16, 32]
+ERROR_RATES = [0.001, 0.01, 0.05]
+
+def measure(function: Callable[[], None], min_time: float = 0.2, max_calls: int = 1000) -> Dict[str, float]:
+    """
+    Time a function and record its peak memory.
+    
+    The function is called repeatedly until min_time has passed (at least
+    once, at most max_calls times) and the fastest call is reported, which is
+    the least disturbed by other load. Peak memory is traced in a separate
+    call, so tracemalloc does not slow down the timed calls.
+    
+    Args:
+    function (callable): Function to measure, called without arguments
+    min_time (float): Minimum total time spent in timed calls (s)
+    max_calls (int): Maximum number of timed calls
+    
+    Returns:
+    dict: Seconds per call, number of timed calls and peak memory in bytes
+    """
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    times = []
+    start = time.perf_counter()
+    while not times or (time.perf_counter() - start < min_time and len(times) < max_calls):
+        call_start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - call_start)
+    return {'seconds_per_call': min(times), 'calls': len(times), 'peak_memory_bytes': peak}
+
+def record(name: str, params: dict, function: Callable[[], None], frames: int, bits: int, min_time: float) -> dict:
+    """
+    Measure one benchmark case.
+    
+    Args:
+    name (str): Benchmarked function
+    params (dict): Parameters of the case
+    function (callable): One call of the case
+    frames (int): Frames processed per call
+    bits (int): Bits processed per call
+    min_time (float): Minimum time spent in timed calls (s)
+    
+    Returns:
+    dict: Case with its frames/s, bits/s and peak memory
+    """
+    result = measure(function, min_time)
+    seconds = result['seconds_per_call']
+    return dict(name=name, params=params, frames_per_s=frames / seconds, bits_per_s=bits / seconds, **result)
+
+def encoder_cases(N: int, frames: int, min_time: float, rng) -> List[dict]:
+    """Benchmark polar encoding and GC balancing for code length N."""
+    B = np.arange(0, N, 16)
+    k = N
+    message = rng.integers(2, size=k - len(B))
+    messages = rng.integers(2, size=(frames, N))
+    c_primes = polar_transform(messages).astype(int)
+    params = dict(N=N, B=len(B))
+    return [
+        record('polar_code_encoding', params, lambda: polar_code_encoding(message, k, B), 1, N, min_time),
+        record('polar_transform', dict(params, frames=frames), lambda: polar_transform(messages), frames, frames * N, min_time),
+        record('find_balanced_vector', params, lambda: find_balanced_vector(c_primes[0], B), 1, N, min_time),
+        record('find_balanced_vectors', dict(params, frames=frames), lambda: find_balanced_vectors(c_primes, B), frames, frames * N, min_time),
+    ]
+
+def channel_cases(N: int, rate: float, frames: int, min_time: float, rng) -> List[dict]:
+    """Benchmark the binary IDS channel and the DNA error simulation for length N."""
+    channel = IDSChannel(rate, rate, rate, seed=rng.integers(2 ** 32))
+    x = rng.integers(2, size=N)
+    xs = rng.integers(2, size=(frames, N))
+    strand = generate_random_dna_sequence(N, rng)
+    params = dict(N=N, pi=rate, pd=rate, ps=rate)
+    return [
+        record('IDSChannel.transmit', params, lambda: channel.transmit(x), 1, N, min_time),
+        record('IDSChannel.transmit_batch', dict(params, frames=frames), lambda: channel.transmit_batch(xs), frames, frames * N, min_time),
+        record('introduce_indel_errors', params, lambda: introduce_indel_errors(strand, rate, rate, rate, rng), 1, 2 * N, min_time),
+    ]
+
+def crc_cases(N: int, frames: int, min_time: float, rng) -> List[dict]:
+    """Benchmark the CRC functions on messages of N bits."""
+    message = rng.integers(2, size=N)
+    messages = rng.integers(2, size=(frames, N))
+    checked = np.concatenate([messages, crc_compute(messages, CRC8_POLYNOMIAL)], axis=1)
+    bitstring = ''.join(map(str, message))
+    polynomial = bin(CRC8_POLYNOMIAL)[2:]
+    params = dict(N=N, polynomial=polynomial)
+    return [
+        record('crc_remainder', params, lambda: crc_remainder(bitstring, polynomial, '0'), 1, N, min_time),
+        record('crc_compute', dict(params, frames=frames), lambda: crc_compute(messages, CRC8_POLYNOMIAL), frames, frames * N, min_time),
+        record('crc_check_batch', dict(params, frames=frames), lambda: crc_check_batch(checked, CRC8_POLYNOMIAL), frames, frames * N, min_time),
+    ]
+
+def decoder_cases(N: int, L: int, rate: float, frames: int, min_time: float, rng) -> List[dict]:
+    """Benchmark SCL decoding of rate-1/2 codewords sent over the IDS channel."""
+    K = N // 2
+    decoder = SCLDecoder(N, K, L, ps=rate, pi=rate, pd=rate, crc_polynomial=CRC8_POLYNOMIAL)
+    channel = IDSChannel(rate, rate, rate, seed=rng.integers(2 ** 32))
+    u = np.zeros((frames, N), dtype=int)
+    u[:, decoder.info_positions] = rng.integers(2, size=(frames, K))
+    y, lengths, _ = channel.transmit_batch(polar_transform(u))
+    received = [row[:length] for row, length in zip(y, lengths)]
+    params = dict(N=N, K=K, L=L, pi=rate, pd=rate, ps=rate)
+    return [
+        record('SCLDecoder.decode', params, lambda: decoder.decode(received[0]), 1, N, min_time),
+        record('SCLDecoder.decode_batch', dict(params, frames=frames), lambda: decoder.decode_batch(received), frames, frames * N, min_time),
+    ]
+
+def run_benchmarks(code_lengths: Sequence[int] = CODE_LENGTHS, list_sizes: Sequence[int] = LIST_SIZES, error_rates: Sequence[float] = ERROR_RATES,
+                   frames: int = 64, decoder_frames: int = 8, min_time: float = 0.2, seed: int = 0, progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Run the benchmark grid.
+    
+    Encoder and CRC cases run for every code length, channel cases for every
+    code length and error rate, and decoder cases for the full grid of code
+    lengths, list sizes and error rates. bits_per_s counts the N code bits of
+    a frame (input bits for the channel, message bits for the CRC).
+    
+    Args:
+    code_lengths (list): Code lengths N
+    list_sizes (list): Decoder list sizes L
+    error_rates (list): Insertion, deletion and substitution probability of each case
+    frames (int): Frames per call in the batched cases
+    decoder_frames (int): Frames per call of SCLDecoder.decode_batch
+    min_time (float): Minimum time spent in timed calls per case (s)
+    seed (int): Seed of the benchmark inputs
+    progress (callable): Called with every finished case
+    
+    Returns:
+    dict: Run metadata and the list of results
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def add(cases):
+        for case in cases:
+            results.append(case)
+            if progress is not None:
+                progress(case)
+    
+    for N in code_lengths:
+        add(encoder_cases(N, frames, min_time, rng))
+        add(crc_cases(N, frames, min_time, rng))
+        for rate in error_rates:
+            add(channel_cases(N, rate, frames, min_time, rng))
+            for L in list_sizes:
+                add(decoder_cases(N, L, rate, decoder_frames, min_time, rng))
+    
+    metadata = dict(timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), python=sys.version.split()[0], numpy=np.__version__,
+                    platform=platform.platform(), processor=platform.processor(), seed=seed, min_time=min_time)
+    return {'metadata': metadata, 'results': results}
+
+def case_key(case: dict) -> str:
+    """Identify a case across runs by its name and parameters."""
+    return case['name'] + json.dumps(case['params'], sort_keys=True)
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.2) -> List[dict]:
+    """
+    Find the cases that got slower than in a baseline run.
+    
+    Args:
+    baseline (dict): Earlier output of run_benchmarks
+    current (dict): New output of run_benchmarks
+    tolerance (float): Allowed relative drop of frames/s
+    
+    Returns:
+    list: Name, parameters and throughput ratio of every regressed case
+    """
+    previous = {case_key(case): case for case in baseline['results']}
+    regressions = []
+    for case in current['results']:
+        old = previous.get(case_key(case))
+        if old is not None:
+            ratio = case['frames_per_s'] / old['frames_per_s']
+            if ratio < 1 - tolerance:
+                regressions.append(dict(name=case['name'], params=case['params'], ratio=ratio))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the encoder, decoder, channel and CRC hot paths.")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file for the results")
+    parser.add_argument('--N', type=int, nargs='+', default=CODE_LENGTHS, help="code lengths")
+    parser.add_argument('--L', type=int, nargs='+', default=LIST_SIZES, help="decoder list sizes")
+    parser.add_argument('--rates', type=float, nargs='+', default=ERROR_RATES, help="insertion/deletion/substitution probabilities")
+    parser.add_argument('--frames', type=int, default=64, help="frames per call in batched cases")
+    parser.add_argument('--decoder-frames', type=int, default=8, help="frames per call of SCLDecoder.decode_batch")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum timed seconds per case")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help="earlier results to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative throughput drop")
+    args = parser.parse_args()
+
+    def report(case):
+        print(f"{case['name']:28s} {json.dumps(case['params']):70s} {case['frames_per_s']:12.1f} frames/s "
+              f"{case['bits_per_s']:14.1f} bits/s {case['peak_memory_bytes'] / 2 ** 20:9.2f} MiB")
+    
+    results = run_benchmarks(args.N, args.L, args.rates, args.frames, args.decoder_frames, args.min_time, args.seed, report)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['name']} {json.dumps(regression['params'])} at {regression['ratio']:.2f}x")
+        sys.exit(1 if regressions else 0)
@@ -1,58 +1,127 @@
-def calculate_probability(i, received_word, decoded_word, pi, pd, ps, D):
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
+
+@lru_cache(maxsize=None)
+def drift_log_terms(pi, pd, D):
   """
-  Calculate the probability of the i-th information bit given the received word and the current decoding information.
+  Calculate the per-drift terms of the probability recursion in log space.
+
+  The terms only depend on the channel and on D, so they are cached and
+  shared by every call with the same parameters.
+
+  Args:
+    pi: The probability of insertion error.
+    pd: The probability of deletion error.
+    D: The maximum absolute value of drift.
+
+  Returns:
+    The log-probabilities of the drift values -D..D, the same list shifted to
+    the drifts -D+1..D+1, and the log-weights with which the alignments enter
+    the probabilities of the bit being 0 and 1 (-inf where they do not).
+  """
+  with np.errstate(divide='ignore'):
+    log_stay = np.log(1 - pi - pd)
+    log_c = np.log((1 - pi - pd) / 2)
+    d = np.arange(-D, D + 2)
+    log_prior = np.maximum(d, 0) * log_stay + np.where(d > 0, np.log(pi), np.log(pd))
+
+    # Unrolled recursion: every W update multiplies the earlier terms by c
+    d = np.arange(-D, D + 1)
+    weight_0 = np.where((d >= 0) & (d < D), np.log(pi / 2) + (D - d) * log_c, -np.inf)
+    weight_1 = np.where(d > -D, np.log(pd / 2) + (D - d - (d < 0)) * log_c, -np.inf)
+
+  for terms in (log_prior, weight_0, weight_1):
+    terms.flags.writeable = False
+  return log_prior[:-1], log_prior[1:], weight_0, weight_1
+
+def alignment_log_likelihoods(received_word, decoded_words, ps, D):
+  """
+  Calculate log P(y' | u_hat) for all 2D + 1 drift alignments at once.
+
+  The alignment for drift d is y'[j + d] = y[j], taken for all drifts as
+  shifted views of one padded copy of y.
 
   Args:
-    i: The index of the information bit.
     received_word: The received word from the channel.
-    decoded_word: The currently decoded word.
+    decoded_words: One decoded word, or a 2-D array with one per row.
+    ps: The probability of substitution error.
+    D: The maximum absolute value of drift.
+
+  Returns:
+    Array of shape (..., 2D + 1) with the log-likelihood of every alignment.
+  """
+  y = np.asarray(received_word)
+  N = len(y)
+  padded = np.concatenate([np.full(D, -1), y, np.full(D + 1, -1)])
+  # Row D - d of the windows is the alignment for drift d
+  y_prime = sliding_window_view(padded, N + 1)[::-1]
+
+  u_hat = np.asarray(decoded_words)
+  u_hat = u_hat[..., :N + 1]
+  u_hat = np.pad(u_hat, [(0, 0)] * (u_hat.ndim - 1) + [(0, N + 1 - u_hat.shape[-1])], constant_values=-2)
+  u_hat = u_hat[..., None, :]
+
+  # Positions where no symbol is received (or decoded) are skipped
+  valid = (y_prime >= 0) & (u_hat >= 0)
+  matches = np.sum(valid & (y_prime == u_hat), axis=-1)
+  mismatches = np.sum(valid, axis=-1) - matches
+  with np.errstate(divide='ignore', invalid='ignore'):
+    return np.where(matches > 0, matches * np.log(1 - ps), 0.0) + np.where(mismatches > 0, mismatches * np.log(ps), 0.0)
+
+def calculate_log_probability_batch(indices, received_word, decoded_word, pi, pd, ps, D):
+  """
+  Calculate the log-probabilities of many information bits for the same received word.
+
+  Args:
+    indices: The indices of the information bits.
+    received_word: The received word from the channel.
+    decoded_word: The currently decoded word, or one decoded word per index.
     pi: The probability of insertion error.
     pd: The probability of deletion error.
     ps: The probability of substitution error.
     D: The maximum absolute value of drift.
 
   Returns:
-    The probability of the i-th information bit being 0 and 1.
+    Two arrays with the log-probabilities of the bits taking their decoded
+    value and the opposite value.
   """
-  N = len(received_word)
-  y = received_word
-  u_hat = decoded_word
-
-  # Initialize the probability of the i-th bit being 0 and 1
-  W_i_0 = 0
-  W_i_1 = 0
-
-  # Iterate over all possible drift values
-  for d in range(-D, D + 1):
-    # Calculate the corresponding sequence y' given the drift d
-    y_prime = [None] * (N + 1)
-    for j in range(N):
-      y_prime[j + d] = y[j]
-
-    # Calculate the probability of y' given u_hat and drift d
-    p_y_prime_u_hat_d = calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d, pi, pd, ps)
-
-    # Update W_i_0 and W_i_1 for drift d
-    if d == 0:
-      W_i_0 = p_y_prime_u_hat_d
-    else:
-      W_i_0 *= (1 - pi - pd) / 2
-      W_i_1 *= (1 - pi - pd) / 2
-
-    # Calculate the probability of y' given u_hat and drift d + 1
-    p_y_prime_u_hat_d_plus_1 = calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d + 1, pi, pd, ps)
-
-    # Update W_i_0 and W_i_1 for drift d + 1
-    if d + 1 <= D:
-      W_i_0 += pi / 2 * p_y_prime_u_hat_d_plus_1
-    if d - 1 >= -D:
-      W_i_1 += pd / 2 * p_y_prime_u_hat_d_plus_1
+  indices = np.asarray(indices)
+  u_hat = np.asarray(decoded_word)
+  log_prior, log_prior_next, weight_0, weight_1 = drift_log_terms(pi, pd, D)
+
+  # Each alignment is scored with the prior of its own drift and of drift + 1
+  alignment = alignment_log_likelihoods(received_word, u_hat, ps, D)
+  p_d = alignment[..., D] + log_prior[D]
+  p_d_plus_1 = alignment + log_prior_next
+
+  log_W_i_0 = np.logaddexp(p_d + D * np.log((1 - pi - pd) / 2), np.logaddexp.reduce(p_d_plus_1 + weight_0, axis=-1))
+  log_W_i_1 = np.logaddexp.reduce(p_d_plus_1 + weight_1, axis=-1)
 
   # Calculate the probability of the i-th bit being 0 and 1
-  W_i_i = W_i_0 if u_hat[i] == 0 else W_i_1
-  W_i_i_plus_1 = W_i_1 if u_hat[i] == 0 else W_i_0
+  u_i = u_hat[..., indices] if u_hat.ndim == 1 else u_hat[np.arange(len(indices)), indices]
+  log_W_i_i = np.where(u_i == 0, log_W_i_0, log_W_i_1)
+  log_W_i_i_plus_1 = np.where(u_i == 0, log_W_i_1, log_W_i_0)
+  return log_W_i_i, log_W_i_i_plus_1
 
-  return W_i_i, W_i_i_plus_1
+def calculate_log_probability(i, received_word, decoded_word, pi, pd, ps, D):
+  """
+  Calculate the log-probability of the i-th information bit given the received word and the current decoding information.
+
+  Args:
+    i: The index of the information bit.
+    received_word: The received word from the channel.
+    decoded_word: The currently decoded word.
+    pi: The probability of insertion error.
+    pd: The probability of deletion error.
+    ps: The probability of substitution error.
+    D: The maximum absolute value of drift.
+
+  Returns:
+    The log-probability of the i-th information bit being 0 and 1.
+  """
+  log_W_i_i, log_W_i_i_plus_1 = calculate_log_probability_batch([i], received_word, decoded_word, pi, pd, ps, D)
+  return float(log_W_i_i[0]), float(log_W_i_i_plus_1[0])
 
 def calculate_probability(i, received_word, decoded_word, pi, pd, ps, D):
   """
@@ -70,45 +139,8 @@ def calculate_probability(i, received_word, decoded_word, pi, pd, ps, D):
   Returns:
     The probability of the i-th information bit being 0 and 1.
   """
-  N = len(received_word)
-  y = received_word
-  u_hat = decoded_word
-
-  # Initialize the probability of the i-th bit being 0 and 1
-  W_i_0 = 0
-  W_i_1 = 0
-
-  # Iterate over all possible drift values
-  for d in range(-D, D + 1):
-    # Calculate the corresponding sequence y' given the drift d
-    y_prime = [None] * (N + 1)
-    for j in range(N):
-      y_prime[j + d] = y[j]
-
-    # Calculate the probability of y' given u_hat and drift d
-    p_y_prime_u_hat_d = calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d, pi, pd, ps)
-
-    # Update W_i_0 and W_i_1 for drift d
-    if d == 0:
-      W_i_0 = p_y_prime_u_hat_d
-    else:
-      W_i_0 *= (1 - pi - pd) / 2
-      W_i_1 *= (1 - pi - pd) / 2
-
-    # Calculate the probability of y' given u_hat and drift d + 1
-    p_y_prime_u_hat_d_plus_1 = calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d + 1, pi, pd, ps)
-
-    # Update W_i_0 and W_i_1 for drift d + 1
-    if d + 1 <= D:
-      W_i_0 += pi / 2 * p_y_prime_u_hat_d_plus_1
-    if d - 1 >= -D:
-      W_i_1 += pd / 2 * p_y_prime_u_hat_d_plus_1
-
-  # Calculate the probability of the i-th bit being 0 and 1
-  W_i_i = W_i_0 if u_hat[i] == 0 else W_i_1
-  W_i_i_plus_1 = W_i_1 if u_hat[i] == 0 else W_i_0
-
-  return W_i_i, W_i_i_plus_1
+  log_W_i_i, log_W_i_i_plus_1 = calculate_log_probability(i, received_word, decoded_word, pi, pd, ps, D)
+  return np.exp(log_W_i_i), np.exp(log_W_i_i_plus_1)
 
 def calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d, pi, pd, ps):
   """
@@ -125,30 +157,16 @@ def calculate_probability_y_prime_u_hat_d(y_prime, u_hat, d, pi, pd, ps):
   Returns:
     The probability of y' given u_hat and drift d.
   """
-  N = len(y_prime)
-  p_y_prime_u_hat_d = 1
-
-  # Iterate over all symbols in y'
-  for j in range(N):
-    if y_prime[j] is None:
-      # Skip the positions where no symbol is received
-      continue
-
-    # Calculate the probability of the received symbol y_prime[j] given the decoded symbol u_hat[j]
-    if y_prime[j] == u_hat[j]:
-      p_y_prime_u_hat_d *= (1 - ps)
-    else:
-      p_y_prime_u_hat_d *= ps
-
-  # Calculate the probability of the drift value d
-  p_drift_d = 1
-  for k in range(d):
-    p_drift_d *= (1 - pi - pd)
-  p_drift_d *= pi if d > 0 else pd
-
-  # Combine the probabilities
-  p_y_prime_u_hat_d *= p_drift_d
-
-  return p_y_prime_u_hat_d
-
-
+  # Skip the positions where no symbol is received
+  received = np.array([y is not None for y in y_prime])
+  y_prime = np.array([-1 if y is None else y for y in y_prime])
+  u_hat = np.asarray(u_hat)[:len(y_prime)]
+  received = received[:len(u_hat)]
+  matches = np.sum(y_prime[:len(u_hat)][received] == u_hat[received])
+  mismatches = np.sum(received) - matches
+
+  # Combine the probabilities of the symbols and of the drift value d
+  with np.errstate(divide='ignore', invalid='ignore'):
+    log_p = np.where(matches > 0, matches * np.log(1 - ps), 0.0) + np.where(mismatches > 0, mismatches * np.log(ps), 0.0)
+    log_p += max(d, 0) * np.log(1 - pi - pd) + np.log(pi if d > 0 else pd)
+  return np.exp(log_p)
@@ -1,38 +1,163 @@
+import numpy as np
+from functools import lru_cache
+
 # CRC generation with g(x) = x^8 + x^7 + x^6 + x^4 + x^2 + 1
-def crc_checksum(data_bits):
-    # CRC polynomial g(x) = x^8 + x^7 + x^6 + x^4 + x^2 + 1
-    generator = 0b111001101  # Binary representation of the polynomial
-    data = data_bits << 8  # Shift to account for the 8-bit CRC
+CRC8_POLYNOMIAL = 0b111001101  # Binary representation of the polynomial
+
+def polynomial_to_int(polynomial):
+    """Convert a polynomial given as a bit string (MSB first) or an int to an int."""
+    if isinstance(polynomial, str):
+        return int(polynomial.lstrip('0') or '0', 2)
+    return int(polynomial)
+
+def _poly_mod(value, polynomial):
+    """Remainder of the GF(2) polynomial division of value by polynomial."""
+    degree = polynomial.bit_length()
+    while value.bit_length() >= degree:
+        value ^= polynomial << (value.bit_length() - degree)
+    return value
+
+@lru_cache(maxsize=None)
+def crc_tables(polynomial: int, slices: int = 4) -> np.ndarray:
+    """
+    Build the slice-by-N lookup tables of a CRC polynomial.
+    
+    Row m maps a byte b to b(x) * x^(8m + width) mod g(x), so that a block of
+    slices bytes is folded into the register with one lookup per byte.
+    Tables are generated once per (polynomial, slices) and cached.
+    
+    Args:
+    polynomial (int): Generator polynomial including the leading term
+    slices (int): Number of bytes processed per step
+    
+    Returns:
+    np.ndarray: uint64 tables of shape (slices, 256)
+    """
+    width = polynomial.bit_length() - 1
+    tables = np.zeros((slices, 256), dtype=np.uint64)
+    for byte in range(256):
+        remainder = _poly_mod(byte << width, polynomial)
+        for m in range(slices):
+            tables[m, byte] = remainder
+            remainder = _poly_mod(remainder << 8, polynomial)
+    tables.flags.writeable = False
+    return tables
+
+def _crc_registers(data, polynomial):
+    """
+    Run the table-driven CRC over bytes whose length is a multiple of the slice count.
+    
+    Args:
+    data (np.ndarray): uint8 array of shape (frames, blocks, slices)
+    polynomial (int): Generator polynomial including the leading term
+    
+    Returns:
+    np.ndarray: uint64 CRC remainders (frames,)
+    """
+    width = polynomial.bit_length() - 1
+    frames, blocks, slices = data.shape
+    tables = crc_tables(polynomial, slices)
+    align = np.uint64(8 * slices - width)
+    mask = np.uint64(0xFF)
+    
+    register = np.zeros(frames, dtype=np.uint64)
+    for block in range(blocks):
+        # Fold the register into the leading bytes of the block
+        folded = register << align
+        update = np.zeros(frames, dtype=np.uint64)
+        for j in range(slices):
+            byte = data[:, block, j] ^ ((folded >> np.uint64(8 * (slices - 1 - j))) & mask)
+            update ^= tables[slices - 1 - j, byte]
+        register = update
+    return register
+
+def crc_packed(data, polynomial, slices: int = 4) -> np.ndarray:
+    """
+    Calculate the CRC remainders of byte messages.
     
-    for i in range(len(data_bits)):
-        if data & (1 << (len(data_bits) + 7 - i)):  # Check leading bit
-            data ^= generator << (len(data_bits) - i)  # XOR with generator
+    Args:
+    data: bytes, or uint8 array of shape (bytes,) or (frames, bytes), MSB first
+    polynomial: Generator polynomial as a bit string or int
+    slices (int): Number of bytes processed per table step
     
-    return data & 0xFF  # Return the final 8-bit CRC
+    Returns:
+    np.ndarray: uint64 CRC remainder of every message (a 0-d array for one message)
+    """
+    polynomial = polynomial_to_int(polynomial)
+    width = polynomial.bit_length() - 1
+    if width > 64 - 8:
+        raise ValueError("CRC polynomials of degree above 56 are not supported.")
+    slices = max(slices, -(-width // 8))
+    
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) else np.asarray(data, dtype=np.uint8)
+    shape = data.shape[:-1]
+    data = data.reshape(int(np.prod(shape)), data.shape[-1])
+    
+    # Leading zero bytes do not change a CRC with zero initial value
+    pad = -data.shape[1] % slices
+    data = np.pad(data, ((0, 0), (pad, 0)))
+    register = _crc_registers(data.reshape(len(data), -1, slices), polynomial)
+    return register.reshape(shape)
+
+def _crc_register_of_bits(bits, polynomial, slices=4):
+    """CRC remainders of bit messages as uint64 integers."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    # Leading zeros do not change a CRC with zero initial value
+    padding = [(0, 0)] * (bits.ndim - 1) + [(-bits.shape[-1] % 8, 0)]
+    return crc_packed(np.packbits(np.pad(bits, padding), axis=-1), polynomial, slices)
+
+def crc_compute(bits, polynomial, slices: int = 4) -> np.ndarray:
+    """
+    Calculate the CRC remainder bits of bit messages.
+    
+    Args:
+    bits: 0/1 array of shape (n,) or (frames, n)
+    polynomial: Generator polynomial as a bit string or int
+    slices (int): Number of bytes processed per table step
+    
+    Returns:
+    np.ndarray: uint8 remainder bits, MSB first, of shape (..., degree)
+    """
+    width = polynomial_to_int(polynomial).bit_length() - 1
+    register = _crc_register_of_bits(bits, polynomial, slices)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+    return ((register[..., None] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+def crc_check_batch(bits, polynomial, slices: int = 4) -> np.ndarray:
+    """
+    Check messages that end with their CRC, e.g. every surviving SCL path at once.
+    
+    Args:
+    bits: 0/1 array of shape (..., n) whose last degree bits hold the CRC
+    polynomial: Generator polynomial as a bit string or int
+    slices (int): Number of bytes processed per table step
+    
+    Returns:
+    np.ndarray: True where the CRC matches, of shape (...)
+    """
+    width = polynomial_to_int(polynomial).bit_length() - 1
+    bits = np.asarray(bits, dtype=np.uint8)
+    remainder = crc_compute(bits[..., :bits.shape[-1] - width], polynomial, slices)
+    return np.all(remainder == bits[..., bits.shape[-1] - width:], axis=-1)
+
+def _bits_from_string(bitstring):
+    return np.frombuffer(bitstring.encode(), dtype=np.uint8) - ord('0')
+
+def crc_checksum(data_bits):
+    """Calculate the CRC-8 of a bit sequence (array or string of '0'/'1')."""
+    if isinstance(data_bits, str):
+        data_bits = _bits_from_string(data_bits)
+    return int(_crc_register_of_bits(data_bits, CRC8_POLYNOMIAL))
 
 def crc_remainder(input_bitstring, polynomial_bitstring, initial_filler):
     """Calculate the CRC remainder of a string of bits using a chosen polynomial.
     initial_filler should be '1' or '0'."""
     polynomial_bitstring = polynomial_bitstring.lstrip('0')
-    len_input = len(input_bitstring)
-    initial_padding = (len(polynomial_bitstring) - 1) * initial_filler
-    input_padded_array = list(input_bitstring + initial_padding)
-    while '1' in input_padded_array[:len_input]:
-        cur_shift = input_padded_array.index('1')
-        for i in range(len(polynomial_bitstring)):
-            input_padded_array[cur_shift + i] \
-            = str(int(polynomial_bitstring[i] != input_padded_array[cur_shift + i]))
-    return ''.join(input_padded_array)[len_input:]
+    remainder = crc_compute(_bits_from_string(input_bitstring), polynomial_bitstring)
+    # The filler sits below the leading term, so it is added to the remainder
+    remainder ^= _bits_from_string((len(polynomial_bitstring) - 1) * initial_filler)
+    return ''.join(map(str, remainder))
 
 def crc_check(input_bitstring, polynomial_bitstring, check_value):
     """Calculate the CRC check of a string of bits using a chosen polynomial."""
-    polynomial_bitstring = polynomial_bitstring.lstrip('0')
-    len_input = len(input_bitstring)
-    initial_padding = check_value
-    input_padded_array = list(input_bitstring + initial_padding)
-    while '1' in input_padded_array[:len_input]:
-        cur_shift = input_padded_array.index('1')
-        for i in range(len(polynomial_bitstring)):
-            input_padded_array[cur_shift + i] \
-            = str(int(polynomial_bitstring[i] != input_padded_array[cur_shift + i]))
-    return ('1' not in ''.join(input_padded_array)[len_input:])
+    return bool(crc_check_batch(_bits_from_string(input_bitstring + check_value), polynomial_bitstring))
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+from SCLDecoder import SCLDecoder
+
+class DecodeScheduler:
+    def __init__(self, max_batch: int = 64, max_delay: float = 0.005, workers: int = 1):
+        """
+        Group single-frame decode requests into batched SCL decodings.
+        
+        Requests are queued per decoder configuration, the key (N, K, L,
+        channel parameters and other decoder arguments). A queue is decoded as
+        one batch as soon as it holds max_batch requests or its oldest request
+        has waited max_delay seconds, whichever comes first. Batches run on a
+        pool of worker threads, each with its own decoder per configuration,
+        built on first use; NumPy releases the GIL in its array loops.
+        
+        Larger max_batch and max_delay raise throughput at the cost of latency.
+        
+        Args:
+        max_batch (int): Maximum number of requests per batch
+        max_delay (float): Maximum time a request waits for its batch to fill (s)
+        workers (int): Number of batches decoded concurrently
+        """
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='decode')
+        self.local = threading.local()
+        self.pending = defaultdict(list)
+        self.timers = {}
+        self.running = set()
+        
+        # Metrics
+        self.requests = 0
+        self.batch_sizes = defaultdict(int)
+        self.flushes = defaultdict(int)
+        self.max_queue_depth = 0
+        self.crc_failures = 0
+        self.answered = 0
+        self.latency = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for their batch to be dispatched."""
+        return sum(len(items) for items in self.pending.values())
+
+    async def decode(self, received: np.ndarray, N: int, K: int, L: int, ps: float = 0.01, pi: float = 0.01, pd: float = 0.01,
+                     **decoder_args) -> Tuple[np.ndarray, bool]:
+        """
+        Decode one received sequence within a batch of requests with the same configuration.
+        
+        Args:
+        received (np.ndarray): Received sequence
+        N, K, L, ps, pi, pd: Arguments of SCLDecoder
+        decoder_args: Other keyword arguments of SCLDecoder (hashable values)
+        
+        Returns:
+        Tuple[np.ndarray, bool]: Decoded message and whether it passed the CRC
+        """
+        key = (N, K, L, ps, pi, pd, tuple(sorted(decoder_args.items())))
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key].append((np.asarray(received), future, time.perf_counter()))
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        
+        if len(self.pending[key]) >= self.max_batch:
+            self.flush(key, 'size')
+        elif key not in self.timers:
+            self.timers[key] = asyncio.get_running_loop().call_later(self.max_delay, self.flush, key, 'deadline')
+        return await future
+
+    def flush(self, key: tuple, reason: str = 'manual'):
+        """Dispatch the queued requests of a configuration as one batch."""
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self.pending.pop(key, [])
+        if not items:
+            return
+        self.flushes[reason] += 1
+        self.batch_sizes[len(items)] += 1
+        task = asyncio.ensure_future(self.run_batch(key, items))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def run_batch(self, key: tuple, items: list):
+        """Decode a batch on the worker pool and resolve the futures of its requests."""
+        received = [item[0] for item in items]
+        try:
+            decoded, crc_passed = await asyncio.get_running_loop().run_in_executor(self.executor, self.decode_batch, key, received)
+        except Exception as error:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        
+        now = time.perf_counter()
+        self.answered += len(items)
+        self.crc_failures += int(np.count_nonzero(~crc_passed))
+        for (_, future, submitted), message, passed in zip(items, decoded, crc_passed):
+            self.latency += now - submitted
+            if not future.done():
+                future.set_result((message, bool(passed)))
+
+    def decode_batch(self, key: tuple, received: list) -> Tuple[np.ndarray, np.ndarray]:
+        """Decode a batch with the decoder of the calling worker thread (runs in the pool)."""
+        decoders = getattr(self.local, 'decoders', None)
+        if decoders is None:
+            decoders = self.local.decoders = {}
+        decoder = decoders.get(key)
+        if decoder is None:
+            N, K, L, ps, pi, pd, decoder_args = key
+            decoder = decoders[key] = SCLDecoder(N, K, L, ps=ps, pi=pi, pd=pd, **dict(decoder_args))
+        decoded = decoder.decode_batch(received)
+        return decoded, decoder.crc_passed.copy()
+
+    async def close(self):
+        """Dispatch every queued request, wait for all batches and stop the workers."""
+        for key in list(self.pending):
+            self.flush(key)
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+        self.executor.shutdown()
+
+    def metrics(self) -> dict:
+        """
+        Scheduler counters.
+        
+        Returns:
+        dict: Requests, batches, current and maximum queue depth, batches in
+        flight, histogram and mean of batch sizes, batches dispatched per
+        reason ('size', 'deadline' or 'manual'), mean latency of answered
+        requests (s) and CRC failures
+        """
+        batches = sum(self.batch_sizes.values())
+        return dict(requests=self.requests, batches=batches, queue_depth=self.queue_depth, max_queue_depth=self.max_queue_depth,
+                    batches_in_flight=len(self.running), batch_sizes=dict(sorted(self.batch_sizes.items())),
+                    mean_batch_size=(self.requests - self.queue_depth) / batches if batches else 0.0,
+                    flushes=dict(self.flushes), mean_latency=self.latency / self.answered if self.answered else 0.0, crc_failures=self.crc_failures)
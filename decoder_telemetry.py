@@ -0,0 +1,190 @@
+import json
+import time
+import numpy as np
+from collections import defaultdict
+from typing import Optional
+
+# Decoder methods timed by each phase; nested calls are charged to the
+# innermost phase, so the phase times add up to the decoding time
+PHASES = {
+    'channel': ('channel_llr',),
+    'llr': ('calculate_llr', 'calculate_node_llr', 'update_node'),
+    'selection': ('select_paths', 'select_candidates'),
+    'extension': ('extend_paths',),
+    'special_nodes': ('decode_node',),
+    'partial_sums': ('update_partial_sums', 'propagate_codeword'),
+    'traceback': ('traceback',),
+    'crc': ('best_paths',),
+    'loop': ('decode_llr_batch', 'decode_list_batch'),
+}
+
+class DecoderTelemetry:
+    def __init__(self):
+        """
+        Recorder of the internals of SCLDecoder runs, see SCLDecoder.enable_telemetry.
+        
+        Set reference to the transmitted u bits (frames, N) of the next batch
+        to classify every frame as decoded correctly, lost from the list (the
+        correct path was pruned) or misselected (the correct path survived
+        but another path was returned).
+        """
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.frames = []
+        self.drift_histograms = []
+        self.list_sizes = defaultdict(int)
+        self.reference = None
+        self.methods = []
+        self.nested = 0.0
+        self.chosen = None
+
+    def timed(self, phase: str, method):
+        """Wrap a bound method to charge its time, minus nested timed calls, to phase."""
+        def wrapper(*args, **kwargs):
+            outer = self.nested
+            self.nested = 0.0
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.seconds[phase] += elapsed - self.nested
+                self.calls[phase] += 1
+                self.nested = outer + elapsed
+        return wrapper
+
+    def attach(self, decoder):
+        """Wrap the methods of a decoder instance; detach restores them."""
+        hooks = {'update_node': self.count_update, 'decode_node': self.count_node,
+                 'channel_llr': self.record_drift, 'best_paths': self.record_choice, 'decode_list_batch': self.record_batch,
+                 'decode_llr_batch': self.finish_batch}
+        for phase, names in PHASES.items():
+            for name in names:
+                method = getattr(decoder, name)
+                if name in hooks:
+                    method = hooks[name](decoder, method)
+                setattr(decoder, name, self.timed(phase, method))
+                self.methods.append(name)
+
+    def detach(self, decoder):
+        """Remove the wrappers installed by attach."""
+        for name in self.methods:
+            delattr(decoder, name)
+        self.methods = []
+
+    def count_update(self, decoder, method):
+        def update_node(level, i):
+            evaluations = decoder.path_metrics.size * (decoder.N >> level)
+            self.counters['g_evaluations' if (i >> (decoder.n - level)) & 1 else 'f_evaluations'] += evaluations
+            return method(level, i)
+        return update_node
+
+    def count_node(self, decoder, method):
+        def decode_node(kind, level, start):
+            self.counters[f'{kind}_nodes'] += len(decoder.path_metrics)
+            return method(kind, level, start)
+        return decode_node
+
+    def record_drift(self, decoder, method):
+        def channel_llr(y, lengths, erased=None):
+            llr = method(y, lengths, erased)
+            D = max(decoder.D, int(np.abs(decoder.drift).max(initial=0)))
+            counts = np.zeros((len(decoder.drift), 2 * D + 1), dtype=int)
+            np.add.at(counts, (np.arange(len(decoder.drift))[:, None], decoder.drift + D), 1)
+            self.drift_histograms.append({'drift': list(range(-D, D + 1)), 'counts': counts.tolist()})
+            return llr
+        return channel_llr
+
+    def record_choice(self, decoder, method):
+        def best_paths(candidates):
+            self.chosen = method(candidates)
+            return self.chosen
+        return best_paths
+
+    def record_batch(self, decoder, method):
+        def decode_list_batch(channel_llr):
+            decoded = method(channel_llr)
+            self.record_frames(decoder, decoded)
+            return decoded
+        return decode_list_batch
+
+    def finish_batch(self, decoder, method):
+        def decode_llr_batch(channel_llr):
+            try:
+                decoded = method(channel_llr)
+            finally:
+                self.reference = None
+            self.counters['batches'] += 1
+            for L, count in zip(*np.unique(decoder.list_sizes, return_counts=True)):
+                self.list_sizes[int(L)] += int(count)
+            return decoded
+        return decode_llr_batch
+
+    def record_frames(self, decoder, decoded: np.ndarray):
+        """
+        Record the outcome of every frame of the list decoding just finished.
+        
+        Frames retried with a larger list by the adaptive mode get a record
+        per list size. The correct path is followed through the stored decisions and parents
+        of every decoding step after the fact, so decoding itself is not
+        slowed down.
+        """
+        frames = len(decoded)
+        metrics = decoder.path_metrics
+        rank = (metrics < metrics[np.arange(frames), self.chosen][:, None]).sum(axis=1)
+        records = [{'frame': int(f), 'list_size': decoder.L, 'crc_passed': bool(passed), 'final_path_rank': int(r)}
+                   for f, passed, r in zip(decoder.batch_frames, decoder.crc_passed, rank)]
+        
+        if self.reference is not None:
+            reference = np.asarray(self.reference, dtype=bool)[decoder.batch_frames]
+            correct = np.zeros(metrics.shape, dtype=bool)
+            correct[:, 0] = True
+            lost_at = np.full(frames, -1)
+            for start, stop in decoder.steps:
+                correct = correct[decoder.frame_index, decoder.parents[start]]
+                correct &= (decoder.decisions[:, :, start:stop] == reference[:, None, start:stop]).all(axis=-1)
+                lost_at[(lost_at < 0) & ~correct.any(axis=1)] = start
+            
+            right = (decoded == reference[:, decoder.info_positions]).all(axis=1)
+            for f, record in enumerate(records):
+                if right[f]:
+                    record['outcome'] = 'correct'
+                elif lost_at[f] >= 0:
+                    record.update(outcome='list_loss', correct_path_lost_at=int(lost_at[f]))
+                else:
+                    record['outcome'] = 'selection'
+                if correct[f].any():
+                    record['correct_path_rank'] = int((metrics[f] < metrics[f][correct[f]].min()).sum())
+        self.frames.extend(records)
+
+    def to_dict(self) -> dict:
+        """
+        Export the recorded telemetry.
+        
+        Returns:
+        dict: Seconds and calls of every phase, counters (batches, elementwise
+        f and g evaluations, special nodes decoded per kind), outcome counts
+        per list size, number of frames per final list size, per-frame records
+        (frame index in its batch, list size, CRC result, metric rank of the
+        returned path and, with a reference, the outcome, bit where the
+        correct path was lost and its final rank), and per-read drift
+        histograms of every channel batch. The drift is the most likely
+        trellis drift after every bit of a read; the drift implied by the
+        individual list paths is not tracked
+        """
+        outcomes = defaultdict(lambda: defaultdict(int))
+        for record in self.frames:
+            if 'outcome' in record:
+                outcomes[record['list_size']][record['outcome']] += 1
+        phases = {phase: {'seconds': self.seconds[phase], 'calls': self.calls[phase]} for phase in PHASES if self.calls[phase]}
+        return {'phases': phases, 'total_seconds': sum(self.seconds.values()), 'counters': dict(self.counters),
+                'outcomes': {L: dict(counts) for L, counts in outcomes.items()}, 'final_list_sizes': dict(self.list_sizes), 'frames': self.frames, 'drift_histograms': self.drift_histograms}
+
+    def to_json(self, path: Optional[str] = None, **kwargs) -> str:
+        """Export the telemetry as JSON, also written to path if given."""
+        text = json.dumps(self.to_dict(), **kwargs)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
@@ -0,0 +1,275 @@
+import argparse
+import json
+import sys
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+from dna_pool import PackedPool, _ranges, read_fasta, read_fastq
+from dna_sequence_generator_and_binary_converter import BASE_TO_CODE
+
+# Default synthesis constraints
+GC_RANGE = (0.4, 0.6)
+WINDOW = 20
+WINDOW_GC_RANGE = (0.25, 0.75)
+MAX_HOMOPOLYMER = 4
+
+# Longest motif matched in one 64-bit window of the packed stream
+MAX_MOTIF_LENGTH = 29
+
+@lru_cache(maxsize=None)
+def _byte_tables() -> Dict[str, np.ndarray]:
+    """
+    Properties of every packed byte holding v = 0..4 valid bases, indexed [v, byte].
+    
+    Returns:
+    dict: Number of G/C bases, first and last base code, length of the
+    leading and trailing run and the longest run inside the byte
+    """
+    tables = {name: np.zeros((5, 256), dtype=np.int8) for name in ('gc', 'first', 'last', 'leading', 'trailing', 'longest')}
+    for byte in range(256):
+        bases = [(byte >> shift) & 3 for shift in (6, 4, 2, 0)]
+        for v in range(1, 5):
+            valid = bases[:v]
+            runs = [1]
+            for previous, base in zip(valid, valid[1:]):
+                runs.append(runs[-1] + 1 if base == previous else 1)
+            leading = next((i for i, base in enumerate(valid) if base != valid[0]), v)
+            tables['gc'][v, byte] = sum(base >> 1 for base in valid)
+            tables['first'][v, byte] = valid[0]
+            tables['last'][v, byte] = valid[-1]
+            tables['leading'][v, byte] = leading
+            tables['trailing'][v, byte] = runs[-1]
+            tables['longest'][v, byte] = max(runs)
+    return tables
+
+def motif_codes(motifs: Sequence[str], reverse_complement: bool = True) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Encode forbidden motifs as 2-bit packed integers, grouped by length.
+    
+    Args:
+    motifs (list): Motifs over A, T, C and G of at most MAX_MOTIF_LENGTH bases
+    reverse_complement (bool): Also match the reverse complement of every motif
+    
+    Returns:
+    dict: For every motif length, the sorted distinct codes and the index in
+    motifs of the motif each code belongs to
+    """
+    groups = {}
+    for index, motif in enumerate(motifs):
+        codes = BASE_TO_CODE[np.frombuffer(motif.upper().encode(), dtype=np.uint8)]
+        if not 0 < len(codes) <= MAX_MOTIF_LENGTH or codes.max() > 3:
+            raise ValueError(f"Motifs must be 1 to {MAX_MOTIF_LENGTH} bases of A, T, C and G, got {motif!r}.")
+        # The complement of a base flips the low bit of its code (A-T, C-G)
+        variants = [codes, codes[::-1] ^ 1] if reverse_complement else [codes]
+        for variant in variants:
+            value = int(sum(int(code) << (2 * (len(variant) - 1 - i)) for i, code in enumerate(variant)))
+            groups.setdefault(len(codes), {}).setdefault(value, index)
+    return {k: (np.array(sorted(values), dtype=np.uint64), np.array([values[v] for v in sorted(values)], dtype=np.int64))
+            for k, values in groups.items()}
+
+def _validate_chunk(data: np.ndarray, lengths: np.ndarray, window: int, motifs: dict, motif_counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Measure the strands of a packed chunk that starts on its first byte.
+    
+    Positions are counted in bases of the packed stream, so strand s
+    occupies bases starts[s] to starts[s] + lengths[s] and its last byte may
+    end with padding bases, which are excluded throughout.
+    """
+    strands = len(lengths)
+    byte_counts = (lengths + 3) // 4
+    byte_offsets = np.concatenate([[0], np.cumsum(byte_counts)])
+    starts = 4 * byte_offsets[:-1]
+    ends = starts + lengths
+    data = data[:byte_offsets[-1]]
+    nonempty = np.flatnonzero(lengths)
+    
+    # Valid bases of every byte: 4 except the last byte of a strand
+    valid = np.full(len(data), 4, dtype=np.int32)
+    partial = nonempty[lengths[nonempty] % 4 != 0]
+    partial_bytes = byte_offsets[partial + 1] - 1
+    valid[partial_bytes] = lengths[partial] % 4
+    tables = _byte_tables()
+
+    def lookup(name, dtype=np.int32):
+        # Full bytes by a 1-D table lookup, then the few partial bytes
+        values = tables[name][4][data].astype(dtype)
+        values[partial_bytes] = tables[name][valid[partial_bytes], data[partial_bytes]]
+        return values
+    
+    # GC content from the high bit of every 2-bit code
+    gc_bits = np.unpackbits(data)[0::2]
+    gc_prefix = np.zeros(len(gc_bits) + 1, dtype=np.int32)
+    np.cumsum(gc_bits, dtype=np.int32, out=gc_prefix[1:])
+    gc_count = gc_prefix[ends] - gc_prefix[starts]
+    gc_fraction = np.divide(gc_count, lengths, out=np.zeros(strands), where=lengths > 0)
+    
+    # Windowed GC: window sums at every start that keeps the window inside its strand
+    window_min, window_max = gc_fraction.copy(), gc_fraction.copy()
+    long = np.flatnonzero(lengths >= window)
+    if len(long):
+        sums = gc_prefix[window:] - gc_prefix[:-window]
+        tail_starts = np.maximum(ends - window + 1, starts)
+        invalid = _ranges(tail_starts, starts + 4 * byte_counts - tail_starts)
+        invalid = invalid[invalid < len(sums)]
+        low, high = sums.copy(), sums.copy()
+        low[invalid], high[invalid] = window + 1, -1
+        window_min[long] = np.minimum.reduceat(low, starts[long]) / window
+        window_max[long] = np.maximum.reduceat(high, starts[long]) / window
+    
+    # Homopolymers: a run crosses from byte j - 1 into byte j when the last
+    # base of j - 1 equals the first base of j within the same strand
+    first, last = lookup('first', np.int8), lookup('last', np.int8)
+    leading, trailing = lookup('leading'), lookup('trailing')
+    link = np.zeros(len(data), dtype=bool)
+    link[1:] = last[:-1] == first[1:]
+    link[byte_offsets[nonempty]] = False
+    # Run ending at the end of every byte: bytes of one base extend the run of
+    # the previous byte, so it reaches back to the last byte that does not
+    extends = link & (leading == valid)
+    index = np.arange(len(data), dtype=np.int32)
+    reset = np.maximum.accumulate(np.where(extends, 0, index)) if len(data) else index
+    valid_prefix = np.cumsum(valid, dtype=np.int32)
+    ending = trailing[reset] + valid_prefix - valid_prefix[reset]
+    joined = np.zeros(len(data), dtype=np.int32)
+    joined[1:] = np.where(link[1:], ending[:-1] + leading[1:], 0)
+    longest = np.maximum(lookup('longest'), joined)
+    homopolymer = np.zeros(strands, dtype=np.int64)
+    if len(nonempty):
+        homopolymer[nonempty] = np.maximum.reduceat(longest, byte_offsets[nonempty])
+    
+    # Motifs: the 64-bit window of the packed stream at byte j holds the
+    # k-mers starting at bases 4j to 4j + 3
+    hits = np.zeros(strands, dtype=np.int64)
+    if motifs:
+        padded = np.concatenate([data, np.zeros(8, dtype=np.uint8)])
+        overlapping = np.lib.stride_tricks.as_strided(padded, shape=(len(data), 8), strides=(1, 1))
+        words = overlapping.view('>u8')[:, 0].astype(np.uint64)
+        for k, (values, owners) in motifs.items():
+            mask = np.uint64((1 << (2 * k)) - 1)
+            for r in range(4):
+                kmers = (words >> np.uint64(64 - 2 * r - 2 * k)) & mask
+                found = np.flatnonzero(np.isin(kmers, values))
+                positions = 4 * found + r
+                strand = np.searchsorted(starts, positions, side='right') - 1
+                inside = positions + k <= ends[strand]
+                hits += np.bincount(strand[inside], minlength=strands)
+                motif_counts += np.bincount(owners[np.searchsorted(values, kmers[found[inside]])], minlength=len(motif_counts))
+    
+    return dict(length=lengths, gc_fraction=gc_fraction, window_gc_min=window_min, window_gc_max=window_max,
+                max_homopolymer=homopolymer, motif_hits=hits)
+
+def validate_pool(pool: PackedPool, window: int = WINDOW, motifs: Sequence[str] = (), reverse_complement: bool = True,
+                  chunk_strands: int = 1 << 16) -> Dict[str, np.ndarray]:
+    """
+    Measure the synthesis constraints of every strand of a packed pool.
+    
+    Strands are processed in chunks directly on the packed bytes: GC counts
+    come from the high bit of every base code, windowed GC from cumulative
+    sums, homopolymer runs from per-byte run tables joined across bytes, and
+    motifs from 64-bit windows of the 2-bit stream.
+    
+    Args:
+    pool (PackedPool): Strands to check
+    window (int): Length of the sliding GC windows in bases; strands
+    shorter than a window use their overall GC fraction
+    motifs (list): Forbidden motifs, e.g. restriction sites
+    reverse_complement (bool): Also count hits of the reverse complements
+    chunk_strands (int): Number of strands measured at once
+    
+    Returns:
+    dict: Per-strand arrays 'length', 'gc_fraction', 'window_gc_min',
+    'window_gc_max', 'max_homopolymer' and 'motif_hits', and the hits of
+    every motif over the pool in 'motif_counts' (in the order of motifs)
+    """
+    encoded = motif_codes(motifs, reverse_complement)
+    motif_counts = np.zeros(len(motifs), dtype=np.int64)
+    chunks = []
+    for start in range(0, len(pool), chunk_strands):
+        stop = min(start + chunk_strands, len(pool))
+        data = pool.data[pool.byte_offsets[start]:pool.byte_offsets[stop]]
+        chunks.append(_validate_chunk(data, pool.lengths[start:stop], window, encoded, motif_counts))
+    
+    keys = ('length', 'gc_fraction', 'window_gc_min', 'window_gc_max', 'max_homopolymer', 'motif_hits')
+    report = {key: np.concatenate([chunk[key] for chunk in chunks]) if chunks else np.zeros(0) for key in keys}
+    report['motif_counts'] = motif_counts
+    return report
+
+def check_constraints(report: Dict[str, np.ndarray], gc_range: Tuple[float, float] = GC_RANGE,
+                      window_gc_range: Tuple[float, float] = WINDOW_GC_RANGE, max_homopolymer: int = MAX_HOMOPOLYMER) -> Dict[str, np.ndarray]:
+    """
+    Check the measurements of validate_pool against limits.
+    
+    Returns:
+    dict: Per-strand violation masks 'gc', 'window_gc', 'homopolymer' and
+    'motif', and 'passed' for the strands that violate none
+    """
+    gc = report['gc_fraction']
+    violations = dict(gc=(gc < gc_range[0]) | (gc > gc_range[1]),
+                      window_gc=(report['window_gc_min'] < window_gc_range[0]) | (report['window_gc_max'] > window_gc_range[1]),
+                      homopolymer=report['max_homopolymer'] > max_homopolymer,
+                      motif=report['motif_hits'] > 0)
+    violations['passed'] = ~np.logical_or.reduce(list(violations.values()))
+    return violations
+
+def pool_histograms(report: Dict[str, np.ndarray], bins: int = 20) -> dict:
+    """
+    Pool-level distributions of the measurements of validate_pool.
+    
+    Returns:
+    dict: Histograms over [0, 1] with bins bins of the GC fraction and of the
+    minimum and maximum window GC ('edges' and 'counts'), and the number of
+    strands per longest homopolymer run and per number of motif hits
+    """
+    edges = np.linspace(0, 1, bins + 1)
+    histograms = {key: {'edges': edges.tolist(), 'counts': np.histogram(report[key], edges)[0].tolist()}
+                  for key in ('gc_fraction', 'window_gc_min', 'window_gc_max')}
+    histograms['max_homopolymer'] = np.bincount(report['max_homopolymer'].astype(np.int64)).tolist()
+    histograms['motif_hits'] = np.bincount(report['motif_hits'].astype(np.int64)).tolist()
+    return histograms
+
+def summarize(report: Dict[str, np.ndarray], motifs: Sequence[str] = (), bins: int = 20, **limits) -> dict:
+    """
+    Summarize a validated pool: strand counts, violations per constraint, histograms and motif hits.
+    
+    Args:
+    report (dict): Output of validate_pool
+    motifs (list): The motifs given to validate_pool
+    bins (int): Number of bins of the fraction histograms
+    limits: Keyword arguments of check_constraints
+    
+    Returns:
+    dict: JSON-serializable summary
+    """
+    violations = check_constraints(report, **limits)
+    return dict(strands=len(report['length']), bases=int(report['length'].sum()),
+                failed=int(np.count_nonzero(~violations['passed'])),
+                violations={key: int(np.count_nonzero(mask)) for key, mask in violations.items() if key != 'passed'},
+                mean_gc_fraction=float(report['gc_fraction'].mean()) if len(report['length']) else 0.0,
+                motif_counts=dict(zip(motifs, report['motif_counts'].tolist())), histograms=pool_histograms(report, bins))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a FASTA/FASTQ pool of strands against synthesis constraints.")
+    parser.add_argument('pool', help="FASTA or FASTQ file of strands")
+    parser.add_argument('--gc', type=float, nargs=2, default=GC_RANGE, help="allowed GC fraction of a strand")
+    parser.add_argument('--window', type=int, default=WINDOW, help="sliding GC window in bases")
+    parser.add_argument('--window-gc', type=float, nargs=2, default=WINDOW_GC_RANGE, help="allowed GC fraction of a window")
+    parser.add_argument('--max-homopolymer', type=int, default=MAX_HOMOPOLYMER, help="longest allowed run of one base")
+    parser.add_argument('--motifs', nargs='*', default=[], help="forbidden motifs")
+    parser.add_argument('--output', help="JSON file for the summary")
+    args = parser.parse_args()
+    
+    is_fastq = args.pool.endswith(('.fastq', '.fq'))
+    pool = read_fastq(args.pool) if is_fastq else read_fasta(args.pool)
+    report = validate_pool(pool, args.window, args.motifs)
+    summary = summarize(report, args.motifs, gc_range=tuple(args.gc), window_gc_range=tuple(args.window_gc),
+                        max_homopolymer=args.max_homopolymer)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    
+    print(f"{summary['strands']} strands, {summary['failed']} failing, mean GC {summary['mean_gc_fraction']:.3f}")
+    for key, count in summary['violations'].items():
+        print(f"  {key}: {count}")
+    for motif, count in summary['motif_counts'].items():
+        print(f"  motif {motif}: {count} hits")
+    sys.exit(1 if summary['failed'] else 0)
@@ -0,0 +1,273 @@
+import os
+import numpy as np
+from typing import Iterator, List, Optional, Sequence, Tuple
+from dna_sequence_generator_and_binary_converter import BASE_TO_CODE, CODE_TO_BASE, dna_to_codes, pack_codes, unpack_codes
+
+def _ranges(starts, lengths):
+    """Flat indices of the ranges [starts[k], starts[k] + lengths[k]) in order."""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+
+class PackedPool:
+    """
+    A pool of DNA strands packed four bases per byte.
+    
+    Strand i has lengths[i] bases stored in data[byte_offsets[i]:byte_offsets[i + 1]],
+    first base in the two most significant bits (see pack_codes). Every strand
+    starts on a byte boundary, so a pool costs a quarter byte per base plus
+    one length per strand.
+    """
+    def __init__(self, data: np.ndarray, lengths: np.ndarray, names: Optional[List[str]] = None):
+        self.data = data
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.byte_offsets = np.concatenate([[0], np.cumsum((self.lengths + 3) // 4)])
+        self.names = names
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, lengths: Optional[np.ndarray] = None, names: Optional[List[str]] = None) -> 'PackedPool':
+        """
+        Pack base codes, either a (strands, length) array or concatenated strands with their lengths.
+        
+        A 2-D array with lengths holds strands padded to a common width.
+        """
+        codes = np.asarray(codes, dtype=np.uint8)
+        if codes.ndim == 2:
+            if lengths is None:
+                return cls(pack_codes(codes).reshape(-1), np.full(len(codes), codes.shape[1]), names)
+            lengths = np.asarray(lengths, dtype=np.int64)
+            codes = codes[np.arange(codes.shape[1]) < lengths[:, None]]
+        lengths = np.asarray(lengths, dtype=np.int64)
+        
+        # Spread the strands to whole bytes before packing
+        pool = cls(np.zeros(0, dtype=np.uint8), lengths, names)
+        quads = np.zeros(4 * pool.byte_offsets[-1], dtype=np.uint8)
+        quads[_ranges(4 * pool.byte_offsets[:-1], lengths)] = codes
+        pool.data = pack_codes(quads)
+        return pool
+
+    @classmethod
+    def from_sequences(cls, sequences: Sequence[str], names: Optional[List[str]] = None) -> 'PackedPool':
+        """Pack DNA sequence strings."""
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+        return cls.from_codes(dna_to_codes(''.join(sequences)), lengths, names)
+
+    @classmethod
+    def concatenate(cls, pools: Sequence['PackedPool']) -> 'PackedPool':
+        """Join pools into one, keeping the strand order."""
+        names = None
+        if pools and all(pool.names is not None for pool in pools):
+            names = [name for pool in pools for name in pool.names]
+        return cls(np.concatenate([pool.data for pool in pools] or [np.zeros(0, dtype=np.uint8)]),
+                   np.concatenate([pool.lengths for pool in pools] or [np.zeros(0, dtype=np.int64)]), names)
+
+    def flat_codes(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Base codes of strands start..stop concatenated without padding."""
+        stop = len(self) if stop is None else stop
+        first = self.byte_offsets[start]
+        quads = unpack_codes(self.data[first:self.byte_offsets[stop]], None)
+        return quads[_ranges(4 * (self.byte_offsets[start:stop] - first), self.lengths[start:stop])]
+
+    def codes(self, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Unpack strands start..stop into a padded code matrix.
+        
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: Base codes padded with 0 (strands, max length)
+        and the length of every strand
+        """
+        stop = len(self) if stop is None else stop
+        lengths = self.lengths[start:stop]
+        first = self.byte_offsets[start]
+        quads = unpack_codes(self.data[first:self.byte_offsets[stop]], None)
+        
+        columns = np.arange(lengths.max(initial=0))
+        inside = columns < lengths[:, None]
+        index = 4 * (self.byte_offsets[start:stop, None] - first) + columns
+        return np.where(inside, quads[np.where(inside, index, 0)] if quads.size else 0, 0).astype(np.uint8), lengths
+
+    def sequence(self, i: int) -> str:
+        """Strand i as a DNA string."""
+        return CODE_TO_BASE[self.flat_codes(i, i + 1)].tobytes().decode()
+
+def _iter_blocks(path: str, fastq: bool, chunk_bytes: int) -> Iterator[np.ndarray]:
+    """Yield memory-mapped views of a FASTA/FASTQ file that end on record boundaries."""
+    if os.path.getsize(path) == 0:
+        return
+    # Views into the map keep it open until the last parsed block is released
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    size = len(buffer)
+    start = 0
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        cut = size
+        while end < size:
+            window = buffer[start:end]
+            if fastq:
+                # Records are four lines
+                newlines = np.flatnonzero(window == 10)
+                complete = len(newlines) // 4 * 4
+                if complete:
+                    cut = start + newlines[complete - 1] + 1
+                    break
+            else:
+                headers = np.flatnonzero((window[1:] == ord('>')) & (window[:-1] == 10))
+                if len(headers):
+                    cut = start + headers[-1] + 1
+                    break
+            # A single record is larger than the chunk
+            end = min(end + chunk_bytes, size)
+        yield buffer[start:cut]
+        start = cut
+
+def _parse_block(block: np.ndarray, fastq: bool, keep_names: bool) -> PackedPool:
+    """Parse the records of a FASTA/FASTQ block into a packed pool."""
+    newline = block == 10
+    line = np.cumsum(newline, dtype=np.int64) - newline
+    line_starts = np.concatenate([[0], np.flatnonzero(newline) + 1])
+    line_starts = line_starts[line_starts < len(block)]
+    
+    if fastq:
+        if not np.all(block[line_starts[0::4]] == ord('@')):
+            raise ValueError("Malformed FASTQ: expected '@' at the start of every record.")
+        header_lines = np.arange(0, len(line_starts), 4)
+        sequence_line = line % 4 == 1
+        record = line // 4
+    else:
+        is_header = block[line_starts] == ord('>')
+        header_lines = np.flatnonzero(is_header)
+        record_of_line = np.cumsum(is_header) - 1
+        # Lines before the first header are ignored
+        sequence_line = ~is_header[line] & (record_of_line[line] >= 0)
+        record = record_of_line[line]
+    
+    sequence_byte = sequence_line & ~newline & (block != ord('\r'))
+    codes = BASE_TO_CODE[block[sequence_byte]]
+    if codes.size and codes.max() > 3:
+        raise ValueError("DNA sequence contains characters other than A, T, C and G.")
+    lengths = np.bincount(record[sequence_byte], minlength=len(header_lines))
+    
+    names = None
+    if keep_names:
+        header_ends = np.append(line_starts, len(block))[header_lines + 1]
+        names = [block[start + 1:end].tobytes().decode().rstrip() for start, end in zip(line_starts[header_lines], header_ends)]
+    return PackedPool.from_codes(codes, lengths, names)
+
+def iter_fasta(path: str, keep_names: bool = False, chunk_bytes: int = 1 << 24) -> Iterator[PackedPool]:
+    """
+    Read a FASTA file through mmap in chunks of whole records.
+    
+    Args:
+    path (str): FASTA file; sequences may span several lines
+    keep_names (bool): Whether to keep the header of every record
+    chunk_bytes (int): Approximate number of file bytes parsed at once
+    
+    Returns:
+    Iterator[PackedPool]: One packed pool per chunk
+    """
+    for block in _iter_blocks(path, False, chunk_bytes):
+        yield _parse_block(block, False, keep_names)
+
+def iter_fastq(path: str, keep_names: bool = False, chunk_bytes: int = 1 << 24) -> Iterator[PackedPool]:
+    """Read a four-line-per-record FASTQ file through mmap in chunks; see iter_fasta."""
+    for block in _iter_blocks(path, True, chunk_bytes):
+        yield _parse_block(block, True, keep_names)
+
+def read_fasta(path: str, keep_names: bool = False, chunk_bytes: int = 1 << 24) -> PackedPool:
+    """Read a whole FASTA file into a packed pool."""
+    return PackedPool.concatenate(list(iter_fasta(path, keep_names, chunk_bytes)))
+
+def read_fastq(path: str, keep_names: bool = False, chunk_bytes: int = 1 << 24) -> PackedPool:
+    """Read a whole FASTQ file into a packed pool; qualities are dropped."""
+    return PackedPool.concatenate(list(iter_fastq(path, keep_names, chunk_bytes)))
+
+def _record_layout(pool: PackedPool, names: Optional[List[str]], fastq: bool, first_index: int):
+    """Encoded record names, their lengths and the byte offset of every record."""
+    names = pool.names if names is None else names
+    if names is None:
+        # Number of decimal digits of every strand index
+        indices = np.arange(first_index, first_index + len(pool))
+        name_lengths = np.searchsorted(10 ** np.arange(1, 19, dtype=np.int64), indices, side='right') + 1
+    else:
+        names = [name.encode() for name in names]
+        name_lengths = np.array([len(name) for name in names], dtype=np.int64)
+    
+    # '>name\nSEQ\n' or '@name\nSEQ\n+\nQUAL\n'
+    lengths = pool.lengths
+    record_sizes = name_lengths + lengths + 3 + (lengths + 3 if fastq else 0)
+    return names, name_lengths, np.concatenate([[0], np.cumsum(record_sizes)])
+
+def _fill_records(out: np.ndarray, pool: PackedPool, layout, fastq: bool, quality: str, first_index: int, start: int, stop: int):
+    """Lay out records start..stop of a pool in out, which begins at the first of them."""
+    names, name_lengths, offsets = layout
+    record = offsets[start:stop] - offsets[start]
+    name_length = name_lengths[start:stop]
+    length = pool.lengths[start:stop]
+    
+    chunk_names = names[start:stop] if names is not None else [str(first_index + i).encode() for i in range(start, stop)]
+    out[record] = ord('@') if fastq else ord('>')
+    out[_ranges(record + 1, name_length)] = np.frombuffer(b''.join(chunk_names), dtype=np.uint8)
+    out[record + 1 + name_length] = ord('\n')
+    
+    sequence = record + 2 + name_length
+    out[_ranges(sequence, length)] = CODE_TO_BASE[pool.flat_codes(start, stop)]
+    out[sequence + length] = ord('\n')
+    if fastq:
+        out[sequence + length + 1] = ord('+')
+        out[sequence + length + 2] = ord('\n')
+        out[_ranges(sequence + length + 3, length)] = ord(quality)
+        out[sequence + 2 * length + 3] = ord('\n')
+
+def _write_records(path: str, pool: PackedPool, names: Optional[List[str]], fastq: bool, quality: str, chunk_records: int):
+    """Write a pool as FASTA or FASTQ records into a memory-mapped output file."""
+    layout = _record_layout(pool, names, fastq, 0)
+    offsets = layout[2]
+    with open(path, 'wb') as f:
+        f.truncate(int(offsets[-1]))
+    if offsets[-1] == 0:
+        return
+    out = np.memmap(path, dtype=np.uint8, mode='r+')
+    try:
+        for start in range(0, len(pool), chunk_records):
+            stop = min(start + chunk_records, len(pool))
+            _fill_records(out[offsets[start]:offsets[stop]], pool, layout, fastq, quality, 0, start, stop)
+        out.flush()
+    finally:
+        del out
+
+def format_fasta(pool: PackedPool, names: Optional[List[str]] = None, first_index: int = 0) -> bytes:
+    """
+    Format a packed pool as FASTA text, e.g. to append it to an open file.
+    
+    Args:
+    pool (PackedPool): Strands to format
+    names (list): Record headers (default: the pool's names, else the strand index)
+    first_index (int): Index of the first strand in default headers
+    
+    Returns:
+    bytes: The FASTA records
+    """
+    layout = _record_layout(pool, names, False, first_index)
+    out = np.empty(layout[2][-1], dtype=np.uint8)
+    _fill_records(out, pool, layout, False, 'I', first_index, 0, len(pool))
+    return out.tobytes()
+
+def write_fasta(path: str, pool: PackedPool, names: Optional[List[str]] = None, chunk_records: int = 1 << 20):
+    """
+    Write a packed pool as a FASTA file through mmap.
+    
+    Args:
+    path (str): Output file
+    pool (PackedPool): Strands to write
+    names (list): Record headers (default: the pool's names, else the strand index)
+    chunk_records (int): Number of records formatted at once
+    """
+    _write_records(path, pool, names, False, 'I', chunk_records)
+
+def write_fastq(path: str, pool: PackedPool, names: Optional[List[str]] = None, quality: str = 'I', chunk_records: int = 1 << 20):
+    """Write a packed pool as a FASTQ file through mmap with a constant quality character; see write_fasta."""
+    _write_records(path, pool, names, True, quality, chunk_records)
@@ -1,24 +1,101 @@
-import random
+import numpy as np
 
-def generate_random_dna_sequence(length):
+# Base i of BASES has the 2-bit code i: A=00, T=01, C=10, G=11
+BASES = 'ATCG'
+
+# Lookup tables between ASCII bases and codes; unknown characters map to 255
+BASE_TO_CODE = np.full(256, 255, dtype=np.uint8)
+BASE_TO_CODE[np.frombuffer(BASES.encode(), dtype=np.uint8)] = np.arange(4)
+BASE_TO_CODE[np.frombuffer(BASES.lower().encode(), dtype=np.uint8)] = np.arange(4)
+CODE_TO_BASE = np.frombuffer(BASES.encode(), dtype=np.uint8)
+
+def generate_random_dna_sequence(length, rng=None):
     """Generate a random DNA sequence of a given length."""
-    bases = ['A', 'T', 'C', 'G']
-    return ''.join(random.choice(bases) for _ in range(length))
+    return codes_to_dna(generate_random_dna_codes(1, length, rng)[0])
 
-def dna_to_binary(dna_sequence):
-    """Convert a DNA sequence to a binary sequence."""
-    base_to_binary = {'A': '00', 'T': '01', 'C': '10', 'G': '11'}
-    return ''.join(base_to_binary[base] for base in dna_sequence)
+def generate_random_dna_codes(count, length, rng=None):
+    """Generate count random strands of a given length as base codes (count, length)."""
+    return np.random.default_rng(rng).integers(0, 4, size=(count, length), dtype=np.uint8)
+
+def dna_to_codes(dna_sequence):
+    """Convert a DNA sequence (str, bytes or ASCII uint8 array) to base codes."""
+    if isinstance(dna_sequence, str):
+        dna_sequence = dna_sequence.encode()
+    if isinstance(dna_sequence, (bytes, bytearray, memoryview)):
+        dna_sequence = np.frombuffer(dna_sequence, dtype=np.uint8)
+    codes = BASE_TO_CODE[dna_sequence]
+    if codes.size and codes.max() > 3:
+        raise ValueError("DNA sequence contains characters other than A, T, C and G.")
+    return codes
+
+def codes_to_dna(codes):
+    """Convert base codes to a DNA sequence string."""
+    return CODE_TO_BASE[codes].tobytes().decode()
 
-# Generate a random DNA sequence
-dna_sequence = generate_random_dna_sequence(100)  # Example length of 100
+def pack_codes(codes):
+    """
+    Pack base codes four per byte, first base in the two most significant bits.
+    
+    The packed bytes are also the bit-packed binary sequence of the strand,
+    MSB first. Strands are padded with A (code 0) to a multiple of four bases.
+    
+    Args:
+    codes (np.ndarray): Base codes of shape (..., length)
+    
+    Returns:
+    np.ndarray: uint8 array of shape (..., ceil(length / 4))
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    padding = [(0, 0)] * (codes.ndim - 1) + [(0, -codes.shape[-1] % 4)]
+    quads = np.pad(codes, padding).reshape(codes.shape[:-1] + (-1, 4))
+    return (quads[..., 0] << 6) | (quads[..., 1] << 4) | (quads[..., 2] << 2) | quads[..., 3]
 
-# Convert DNA sequence to binary
-binary_sequence = dna_to_binary(dna_sequence)
+def unpack_codes(packed, length):
+    """Unpack the first length base codes of packed strands (..., bytes)."""
+    packed = np.asarray(packed, dtype=np.uint8)
+    codes = (packed[..., None] >> np.array([6, 4, 2, 0], dtype=np.uint8)) & 3
+    return codes.reshape(packed.shape[:-1] + (-1,))[..., :length]
 
-# Split the binary sequence into odd and even indexed sequences
-odd_indexed_sequence = binary_sequence[1::2]
-even_indexed_sequence = binary_sequence[::2]
+def codes_to_bits(codes):
+    """Convert base codes (..., length) to the binary sequence (..., 2 * length)."""
+    codes = np.asarray(codes, dtype=np.uint8)
+    return np.stack([codes >> 1, codes & 1], axis=-1).reshape(codes.shape[:-1] + (-1,))
 
-dna_sequence, binary_sequence, odd_indexed_sequence, even_indexed_sequence
+def bits_to_codes(bits):
+    """Convert a binary sequence (..., 2 * length) to base codes (..., length)."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    return (bits[..., 0::2] << 1) | bits[..., 1::2]
+
+def split_bit_streams(codes):
+    """
+    Split base codes into the even- and odd-indexed bit streams of their binary sequence.
+    
+    The even stream holds the first bit of every base, which is 1 exactly for
+    C and G, and the odd stream holds the second bit.
+    
+    Returns:
+    tuple: (even_indexed_bits, odd_indexed_bits), each of shape (..., length)
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    return codes >> 1, codes & 1
+
+def merge_bit_streams(even_indexed_bits, odd_indexed_bits):
+    """Combine even- and odd-indexed bit streams back into base codes."""
+    return (np.asarray(even_indexed_bits, dtype=np.uint8) << 1) | np.asarray(odd_indexed_bits, dtype=np.uint8)
+
+def dna_to_binary(dna_sequence):
+    """Convert a DNA sequence to a binary sequence."""
+    return (codes_to_bits(dna_to_codes(dna_sequence)) + ord('0')).tobytes().decode()
 
+if __name__ == "__main__":
+    # Generate a random DNA sequence
+    dna_sequence = generate_random_dna_sequence(100)  # Example length of 100
+    
+    # Convert DNA sequence to binary
+    binary_sequence = dna_to_binary(dna_sequence)
+    
+    # Split the binary sequence into odd and even indexed sequences
+    odd_indexed_sequence = binary_sequence[1::2]
+    even_indexed_sequence = binary_sequence[::2]
+    
+    print(dna_sequence, binary_sequence, odd_indexed_sequence, even_indexed_sequence)
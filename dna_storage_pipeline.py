@@ -0,0 +1,217 @@
+import os
+import queue
+import threading
+import numpy as np
+from math import gcd
+from typing import Iterable, Iterator, Optional, Sequence
+from SCLDecoder import SCLDecoder
+from crc import CRC8_POLYNOMIAL, crc_compute, polynomial_to_int
+from dna_pool import PackedPool, format_fasta, iter_fasta
+from dna_sequence_generator_and_binary_converter import merge_bit_streams, split_bit_streams
+from encoder import find_balanced_vectors, polar_transform
+
+# Bytes of the file length stored at the start of the payload
+LENGTH_BYTES = 8
+
+def prefetch(iterable: Iterable, depth: int = 2) -> Iterator:
+    """
+    Run an iterator in a background thread, buffering at most depth items.
+    
+    Chaining prefetched stages lets reading, coding and writing overlap while
+    the bounded queues keep the number of chunks in memory constant. NumPy
+    releases the GIL in its array loops, so the stages run concurrently.
+    """
+    items = queue.Queue(depth)
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((True, item))
+            items.put((False, None))
+        except BaseException as error:
+            items.put((False, error))
+    
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        more, item = items.get()
+        if not more:
+            if item is not None:
+                raise item
+            return
+        yield item
+
+class DNAStoragePipeline:
+    def __init__(self, N: int, K: int, B: Optional[Sequence[int]] = None, L: int = 4, ps: float = 0.01, pi: float = 0.01, pd: float = 0.01,
+                 crc_polynomial=CRC8_POLYNOMIAL, construction: str = 'bhattacharyya', chunk_strands: int = 1024, depth: int = 2):
+        """
+        Initialize a file to DNA strand pipeline.
+        
+        Every strand carries two polar codewords of length N: its even bit
+        stream (1 for C and G) is a codeword made GC-balanced by flipping
+        positions of B, and its odd bit stream is a plain codeword. Each
+        codeword holds K - (CRC width) payload bits followed by their CRC in
+        the information positions of the decoder.
+        
+        Args:
+        N (int): Strand length in bases (must be a power of 2)
+        K (int): Number of information bits per codeword, CRC included
+        B (list): Codeword positions flipped for GC balance (default: N / 16
+        evenly spaced positions)
+        L (int): List size of the decoder
+        ps (float): Base substitution probability
+        pi (float): Base insertion probability
+        pd (float): Base deletion probability
+        crc_polynomial: CRC generator (bit string or int)
+        construction (str): Method of polar_construction for the frozen bits
+        chunk_strands (int): Number of strands coded at once
+        depth (int): Number of chunks buffered between stages
+        """
+        self.N = N
+        self.K = K
+        self.B = np.arange(0, N, 16) if B is None else np.asarray(B, dtype=int)
+        self.crc_polynomial = crc_polynomial
+        self.crc_width = polynomial_to_int(crc_polynomial).bit_length() - 1
+        self.message_bits = K - self.crc_width
+        if self.message_bits <= 0:
+            raise ValueError("K must exceed the CRC width.")
+        
+        # A base substitution changes each bit of the base with probability 2/3
+        self.decoder = SCLDecoder(N, K, L, ps=2 * ps / 3, pi=pi, pd=pd, crc_polynomial=crc_polynomial, construction=construction, B=self.B)
+        self.info_positions = self.decoder.info_positions
+        
+        # Payload bits per strand; chunks hold a whole number of bytes
+        self.strand_bits = 2 * self.message_bits
+        step = 8 // gcd(self.strand_bits, 8)
+        self.chunk_strands = -(-chunk_strands // step) * step
+        self.depth = depth
+        self.crc_failures = 0
+
+    def read_blocks(self, path: str) -> Iterator[bytes]:
+        """Yield the length-prefixed contents of a file in chunks of chunk_strands strands."""
+        block = self.chunk_strands * self.strand_bits // 8
+        with open(path, 'rb') as f:
+            data = os.fstat(f.fileno()).st_size.to_bytes(LENGTH_BYTES, 'big') + f.read(block - LENGTH_BYTES)
+            while data:
+                yield data
+                data = f.read(block)
+
+    def encode_block(self, data: bytes) -> PackedPool:
+        """
+        Encode a chunk of payload bytes into GC-balanced strands.
+        
+        Args:
+        data (bytes): Payload, zero-padded to whole strands
+        
+        Returns:
+        PackedPool: Encoded strands
+        """
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        bits = np.pad(bits, (0, -len(bits) % self.strand_bits))
+        messages = bits.reshape(-1, self.message_bits)
+        
+        # Messages and their CRC in the information positions of u
+        u = np.zeros((len(messages), self.N), dtype=np.uint8)
+        u[:, self.info_positions] = np.concatenate([messages, crc_compute(messages, self.crc_polynomial)], axis=1)
+        codewords = polar_transform(u).reshape(-1, 2, self.N)
+        
+        b, _ = find_balanced_vectors(codewords[:, 0], self.B)
+        return PackedPool.from_codes(merge_bit_streams(codewords[:, 0] ^ b, codewords[:, 1]))
+
+    def encode_file(self, input_path: str, fasta_path: str) -> int:
+        """
+        Encode a file into a FASTA file of strands.
+        
+        Reading, encoding and writing run as overlapping stages on chunks of
+        chunk_strands strands, so memory use does not grow with the file.
+        
+        Args:
+        input_path (str): File to store
+        fasta_path (str): Output FASTA file
+        
+        Returns:
+        int: Number of strands written
+        """
+        strands = 0
+        with open(fasta_path, 'wb') as out:
+            for pool in prefetch(map(self.encode_block, prefetch(self.read_blocks(input_path), self.depth)), self.depth):
+                out.write(format_fasta(pool, first_index=strands))
+                strands += len(pool)
+        return strands
+
+    def decode_reads(self, codes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Decode one read per strand back into payload bits.
+        
+        Both bit streams of the reads go through the SCL decoder as one batch.
+        Positions of B carry no information on the even stream, as they may
+        have been flipped, so their channel LLRs are erased.
+        
+        Args:
+        codes (np.ndarray): Base codes of the reads in strand order, zero-padded (strands, max length)
+        lengths (np.ndarray): Length of every read (strands,)
+        
+        Returns:
+        np.ndarray: Payload bits of the strands (strands * strand_bits,)
+        """
+        even, odd = split_bit_streams(codes)
+        streams = np.stack([even, odd], axis=1).reshape(2 * len(codes), -1)
+        even_frames = np.arange(len(streams)) % 2 == 0
+        llr = self.decoder.channel_llr(streams, np.repeat(lengths, 2), even_frames)
+        
+        decoded = self.decoder.decode_llr_batch(llr)
+        self.crc_failures += int(np.count_nonzero(~self.decoder.crc_passed))
+        return decoded[:, :self.message_bits].reshape(-1).astype(np.uint8)
+
+    def decode_file(self, fasta_path: str, output_path: str) -> int:
+        """
+        Decode a FASTA file of reads, one per strand and in strand order, into a file.
+        
+        Args:
+        fasta_path (str): FASTA file of reads
+        output_path (str): Restored file
+        
+        Returns:
+        int: Number of codewords that failed the CRC
+        """
+        self.crc_failures = 0
+
+        def batches():
+            for pool in iter_fasta(fasta_path):
+                for start in range(0, len(pool), self.chunk_strands):
+                    yield pool.codes(start, min(start + self.chunk_strands, len(pool)))
+        
+        remaining = None
+        pending = np.zeros(0, dtype=np.uint8)
+        with open(output_path, 'wb') as out:
+            for bits in prefetch((self.decode_reads(*reads) for reads in prefetch(batches(), self.depth)), self.depth):
+                bits = np.concatenate([pending, bits])
+                whole = len(bits) // 8 * 8
+                data = np.packbits(bits[:whole]).tobytes()
+                pending = bits[whole:]
+                
+                if remaining is None:
+                    if len(data) < LENGTH_BYTES:
+                        pending = bits
+                        continue
+                    remaining = int.from_bytes(data[:LENGTH_BYTES], 'big')
+                    data = data[LENGTH_BYTES:]
+                out.write(data[:remaining])
+                remaining -= min(remaining, len(data))
+        return self.crc_failures
+
+# Example usage
+if __name__ == "__main__":
+    import filecmp
+    import tempfile
+    
+    pipeline = DNAStoragePipeline(N=128, K=64, L=8, ps=0.005, pi=0.002, pd=0.002)
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.bin')
+        fasta = os.path.join(directory, 'strands.fasta')
+        restored = os.path.join(directory, 'restored.bin')
+        with open(source, 'wb') as f:
+            f.write(os.urandom(10000))
+        
+        strands = pipeline.encode_file(source, fasta)
+        failures = pipeline.decode_file(fasta, restored)
+        print(f"{strands} strands, {failures} CRC failures, restored: {filecmp.cmp(source, restored, shallow=False)}")
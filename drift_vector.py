@@ -1,4 +1,6 @@
+import threading
 import numpy as np
+from typing import Tuple
 
 def build_transition_matrix(D, p_i, p_d):
     size = 2 * D + 1
@@ -23,10 +25,66 @@ def build_transition_matrix(D, p_i, p_d):
     
     return P
 
+# Drift priors per (D, p_i, p_d), see drift_priors
+_priors = {}
+_priors_lock = threading.Lock()
+
+def cumulative_rows(P):
+    """
+    Cumulative transition rows offset by their row index, for inverse-CDF sampling.
+    
+    Row r of the result holds r + cumsum(P[r]), ending exactly at r + 1, so
+    the rows concatenate into one increasing sequence and a single
+    searchsorted finds the next state of every sequence at once.
+    
+    Args:
+    P (np.ndarray): Transition matrix (size, size)
+    
+    Returns:
+    np.ndarray: Flattened offset cumulative rows (size * size,)
+    """
+    cumulative = np.cumsum(P, axis=1)
+    cumulative[:, -1] = 1.0
+    return (cumulative + np.arange(len(P))[:, None]).reshape(-1)
+
+def sample_drift_paths(count, length, D, p_i, p_d, rng=None, initial=0):
+    """
+    Sample drift sequences of the Markov chain of build_transition_matrix.
+    
+    All sequences advance together, one uniform number per sequence and
+    step, through inverse-CDF lookups in the cumulative transition rows.
+    
+    Args:
+    count (int): Number of sequences
+    length (int): Number of steps of every sequence
+    D (int): Maximum absolute value of drift
+    p_i (float): Probability of insertion (drift + 1)
+    p_d (float): Probability of deletion (drift - 1)
+    rng (np.random.Generator): Random generator (default: a new one)
+    initial (int): Drift before the first step
+    
+    Returns:
+    numpy.array: Drift after every step (count, length)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    size = 2 * D + 1
+    rows = cumulative_rows(build_transition_matrix(D, p_i, p_d))
+    uniforms = rng.random((length, count))
+    
+    drift = np.zeros((count, length), dtype=int)
+    state = np.full(count, initial + D)
+    for i in range(length):
+        state = np.searchsorted(rows, state + uniforms[i], side='right') - state * size
+        drift[:, i] = state - D
+    return drift
+
 def markov_drift_vector(D, p_i, p_d):
     """
     Generate a drift vector using a Markov process.
     
+    The drift moves between -1, 0 and 1 following build_transition_matrix
+    with a maximum drift of 1.
+    
     Args:
     D (int): Length of the drift vector
     p_i (float): Probability of insertion
@@ -35,35 +93,75 @@ def markov_drift_vector(D, p_i, p_d):
     Returns:
     numpy.array: Drift vector
     """
-    drift_vector = np.zeros(D, dtype=int)
-    current_state = 0
-    
-    for i in range(D):
-        if current_state == 0:
-            # No drift
-            if np.random.random() < p_i:
-                current_state = 1  # Insertion
-            elif np.random.random() < p_d:
-                current_state = -1  # Deletion
-        elif current_state == 1:
-            # After insertion
-            if np.random.random() < p_d:
-                current_state = 0  # Back to no drift
-        elif current_state == -1:
-            # After deletion
-            if np.random.random() < p_i:
-                current_state = 0  # Back to no drift
-        
-        drift_vector[i] = current_state
-    
-    return drift_vector
+    return sample_drift_paths(1, D, 1, p_i, p_d)[0]
 
-# Example parameters
-D = 3  # Example value for D
-p_i = 0.4  # Example value for p_i
-p_d = 0.3  # Example value for p_d
+def stationary_distribution(P):
+    """Stationary distribution pi = pi P of a transition matrix, by least squares."""
+    size = len(P)
+    A = np.vstack([P.T - np.eye(size), np.ones(size)])
+    b = np.zeros(size + 1)
+    b[-1] = 1.0
+    pi = np.linalg.lstsq(A, b, rcond=None)[0]
+    pi = np.maximum(pi, 0.0)
+    return pi / pi.sum()
 
-# Build the transition matrix
-transition_matrix = build_transition_matrix(D, p_i, p_d)
+def drift_priors(length, D, p_i, p_d) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prior distribution of the drift after every position, cached per (D, p_i, p_d).
+    
+    Row i is the distribution after i steps from drift 0, the first row of
+    P^i. The table of a key is extended on demand and shared by all callers,
+    so trellis and decoder code can look the priors up instead of computing
+    matrix powers per frame.
+    
+    Args:
+    length (int): Last position needed
+    D (int): Maximum absolute value of drift
+    p_i (float): Probability of insertion
+    p_d (float): Probability of deletion
+    
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Read-only priors of drift -D..D after
+    0..length steps (length + 1, 2D + 1), and the stationary distribution
+    """
+    key = (int(D), float(p_i), float(p_d))
+    with _priors_lock:
+        entry = _priors.get(key)
+        if entry is None:
+            P = build_transition_matrix(*key)
+            start = np.zeros((1, 2 * D + 1))
+            start[0, D] = 1.0
+            entry = _priors[key] = {'P': P, 'rows': start, 'stationary': stationary_distribution(P)}
+            entry['stationary'].flags.writeable = False
+        
+        rows = entry['rows']
+        if len(rows) <= length:
+            grown = np.zeros((max(length + 1, 2 * len(rows)), rows.shape[1]))
+            grown[:len(rows)] = rows
+            
+            # P is tridiagonal: row @ P only mixes neighbouring drifts
+            P = entry['P']
+            stay, up, down = np.diag(P), np.diag(P, 1), np.diag(P, -1)
+            for i in range(len(rows), len(grown)):
+                previous = grown[i - 1]
+                grown[i] = previous * stay
+                grown[i, 1:] += previous[:-1] * up
+                grown[i, :-1] += previous[1:] * down
+            grown.flags.writeable = False
+            rows = entry['rows'] = grown
+    return rows[:length + 1], entry['stationary']
 
-#print("Transition Matrix:\n", transition_matrix)
+# Example usage
+if __name__ == "__main__":
+    D = 3  # Example value for D
+    p_i = 0.4  # Example value for p_i
+    p_d = 0.3  # Example value for p_d
+    
+    # Build the transition matrix
+    transition_matrix = build_transition_matrix(D, p_i, p_d)
+    print("Transition Matrix:\n", transition_matrix)
+    
+    priors, stationary = drift_priors(10, D, p_i, p_d)
+    print("Drift prior after 10 steps:", priors[10])
+    print("Stationary distribution:", stationary)
+    print("Sampled drift paths:\n", sample_drift_paths(4, 10, D, p_i, p_d, np.random.default_rng(0)))
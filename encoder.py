@@ -1,3 +1,4 @@
+import warnings
 import numpy as np
 
 def polar_transform_matrix(n):
@@ -12,53 +13,128 @@ def polar_encode(message, G):
     """Encode message using polar codes."""
     return np.dot(message, G) % 2
 
+def polar_transform_packed(packed, N):
+    """
+    Apply the polar transform in place to bit-packed frames.
+    
+    The transform x = u G with G the n-fold Kronecker power of F is evaluated as n butterfly
+    stages of XORs, so a frame costs O(N log N) bit operations instead of the
+    O(N^2) dense product. Bits are packed MSB-first as produced by np.packbits.
+    
+    Args:
+    packed (np.ndarray): uint8 array of shape (frames, ceil(N / 8)).
+    N (int): Code length (must be a power of 2).
+    
+    Returns:
+    np.ndarray: The transformed array (the same object as packed).
+    """
+    # Stages with a stride below one byte swap bits inside every byte
+    for shift, mask in ((1, 0x55), (2, 0x33), (4, 0x0F)):
+        if shift >= N:
+            break
+        packed ^= (packed & mask) << shift
+    
+    # Remaining stages XOR whole blocks of bytes
+    half = 1
+    while 8 * half < N:
+        blocks = packed.reshape(packed.shape[0], -1, 2, half)
+        blocks[:, :, 0] ^= blocks[:, :, 1]
+        half *= 2
+    return packed
+
+def polar_transform(u):
+    """
+    Encode one message or a batch of messages with the butterfly transform.
+    
+    Gives the same bits as polar_encode(u, polar_transform_matrix(n)) without
+    building the generator matrix.
+    
+    Args:
+    u (np.ndarray): Bits of shape (N,) or (frames, N), N a power of 2.
+    
+    Returns:
+    np.ndarray: uint8 codeword bits with the same shape as u.
+    """
+    u = np.asarray(u)
+    N = u.shape[-1]
+    if N < 1 or N & (N - 1):
+        raise ValueError("Code length must be a power of 2.")
+    
+    packed = np.packbits(u.reshape(-1, N).astype(bool), axis=-1)
+    polar_transform_packed(packed, N)
+    return np.unpackbits(packed, axis=-1, count=N).reshape(u.shape)
+
+def find_balanced_vectors(c_primes, B):
+    """
+    Find balanced vectors for a batch of codewords.
+    
+    Flipping x of the positions in B where a codeword is 0 and y of those
+    where it is 1 changes its weight by x - y, so every weight between
+    w - (ones in B) and w + (zeros in B) is reachable and the one closest to
+    N / 2 is optimal. This gives the same imbalance as trying all 2^|B|
+    flip vectors, in O(|B|) per codeword.
+    
+    Args:
+    c_primes (np.array): Codewords of shape (frames, N).
+    B (list): Indexes that may be flipped.
+    
+    Returns:
+    tuple: The flip vectors b (frames, N) and the achieved imbalance
+    |sum(c' + b) - N / 2| of every codeword (frames,).
+    """
+    c_primes = np.asarray(c_primes)
+    B = np.asarray(B, dtype=int)
+    length = c_primes.shape[-1]
+    weight = c_primes.sum(axis=-1)
+    
+    zeros = c_primes[:, B] == 0
+    ones = ~zeros
+    delta = np.clip(length // 2 - weight, -ones.sum(axis=-1), zeros.sum(axis=-1))[:, None]
+    
+    # Flip the first delta zeros (or the first -delta ones) of B in order
+    flips = (zeros & (np.cumsum(zeros, axis=-1) <= delta)) | (ones & (np.cumsum(ones, axis=-1) <= -delta))
+    b = np.zeros(c_primes.shape, dtype=int)
+    b[:, B] = flips
+    imbalance = np.abs(weight + delta[:, 0] - length / 2)
+    return b, imbalance
+
 def find_balanced_vector(c_prime, B):
     """Find a balanced vector b for codeword c_prime."""
-    length = len(c_prime)
-    min_imbalance = float('inf')
-    best_vector = np.zeros(length, dtype=int)
-    
-    # Use a more efficient method for large B
-    if len(B) > 20:  # Threshold can be adjusted
-        return find_balanced_vector_greedy(c_prime, B)
-    
-    for candidate in range(2**len(B)):
-        b = np.zeros(length, dtype=int)
-        b[B] = list(map(int, bin(candidate)[2:].zfill(len(B))))
-        
-        c_prime_plus_b = (c_prime + b) % 2
-        imbalance = np.abs(np.sum(c_prime_plus_b) - length / 2)
-        
-        if imbalance < min_imbalance:
-            min_imbalance = imbalance
-            best_vector = b
-    
-    return best_vector
+    b, _ = find_balanced_vectors(np.asarray(c_prime)[None], B)
+    return b[0]
 
 def find_balanced_vector_greedy(c_prime, B):
-    """Find a balanced vector b using a greedy approach."""
-    length = len(c_prime)
-    b = np.zeros(length, dtype=int)
-    current_sum = np.sum(c_prime)
-    
-    for index in B:
-        if current_sum < length / 2:
-            b[index] = 1
-            current_sum += 1
-        else:
-            break
+    """
+    Find a balanced vector b for codeword c_prime.
     
-    return b
+    Deprecated: use find_balanced_vector, or find_balanced_vectors for a
+    batch. The flips now come from find_balanced_vectors, which reaches the
+    weight closest to N / 2 in both directions, so they can differ from the
+    old greedy result.
+    """
+    warnings.warn("find_balanced_vector_greedy is deprecated, use find_balanced_vector or find_balanced_vectors",
+                  DeprecationWarning, stacklevel=2)
+    return find_balanced_vector(c_prime, B)
 
-def polar_code_encoding(message, k, B, construction='standard'):
+def polar_code_encoding(message, k, B, construction='bhattacharyya', pi=0.01, pd=0.01, ps=0.01):
     """
     Encode a message using polar codes with reduced codeword imbalance.
     
+    With the default arguments the information set is the one of
+    SCLDecoder(N, k - len(B), L, B=B), so its decode() returns the message.
+    
     Args:
-    message (np.array): The message to encode.
-    k (int): Number of information bits.
-    B (list): Indexes where zeros are to be inserted.
-    construction (str): Type of polar code construction ('standard' or 'custom').
+    message (np.array): The message to encode, of length k - len(B).
+    k (int): Number of information bits, including the positions of B.
+    B (list): Codeword positions that may be flipped to balance the
+    codeword, as the B of SCLDecoder, which erases their channel LLRs.
+    construction (str): Type of polar code construction: 'bhattacharyya',
+    'ga' or 'monte_carlo' place the message in the most reliable indexes
+    found by polar_construction (accounting for the erased positions of B),
+    'standard' in the first k - len(B) indexes.
+    pi (float): Insertion probability the construction is made for.
+    pd (float): Deletion probability the construction is made for.
+    ps (float): Substitution probability the construction is made for.
     
     Returns:
     np.array: The encoded codeword.
@@ -66,24 +142,23 @@ def polar_code_encoding(message, k, B, construction='standard'):
     n = int(np.ceil(np.log2(k)))
     N = 2**n
     
-    if len(message) != k:
-        raise ValueError("Message length must be equal to k.")
+    k_prime = k - len(B)
+    if len(message) != k_prime:
+        raise ValueError("Message length must be equal to k - len(B).")
     
-    if max(B) >= N:
+    if len(B) and max(B) >= N:
         raise ValueError("All indices in B must be less than N.")
     
-    G = polar_transform_matrix(n)
-    
-    k_prime = k - len(B)
     m_prime = np.zeros(N, dtype=int)
     
-    non_B_indices = np.setdiff1d(range(N), B)
-    if len(non_B_indices) < k_prime:
-        raise ValueError("Not enough non-B indices available to place all message bits.")
+    if construction == 'standard':
+        m_prime[:k_prime] = message
+    else:
+        # Imported here as polar_construction builds on this module
+        from polar_construction import information_set
+        m_prime[information_set(N, k_prime, pi, pd, ps, B, method=construction)] = message
     
-    m_prime[non_B_indices[:k_prime]] = message
-    
-    c_prime = polar_encode(m_prime, G)
+    c_prime = polar_transform(m_prime).astype(int)
     
     b = find_balanced_vector(c_prime, B)
     
@@ -91,10 +166,11 @@ def polar_code_encoding(message, k, B, construction='standard'):
     return c
 
 # Example usage
-k = 128
-B = [5, 10, 15, 20, 25, 30, 35, 40]
-message = np.random.randint(2, size=k)
-
-encoded_codeword = polar_code_encoding(message, k, B)
-print("Encoded codeword:", encoded_codeword)
-print("Codeword imbalance:", abs(np.sum(encoded_codeword) - len(encoded_codeword)/2))
+if __name__ == "__main__":
+    k = 128
+    B = [5, 10, 15, 20, 25, 30, 35, 40]
+    message = np.random.randint(2, size=k - len(B))
+    
+    encoded_codeword = polar_code_encoding(message, k, B)
+    print("Encoded codeword:", encoded_codeword)
+    print("Codeword imbalance:", abs(np.sum(encoded_codeword) - len(encoded_codeword)/2))
@@ -0,0 +1,59 @@
+import numpy as np
+from typing import Tuple
+
+def simulate_ids_channel(x: np.ndarray, pi: float, pd: float, ps: float, q: int = 2, rng=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Transmit a batch of sequences over the insertion/deletion/substitution channel.
+    
+    Each input symbol is deleted with probability pd, preceded by a uniformly
+    random inserted symbol with probability pi, and otherwise transmitted
+    alone. Transmitted symbols are replaced by a uniformly chosen different
+    symbol with probability ps. All error events of the batch are drawn at
+    once; the outputs are then placed with a cumulative sum of the number of
+    symbols each input emits.
+    
+    Args:
+    x (np.ndarray): Input symbols in [0, q), of shape (N,) or (frames, N)
+    pi (float): Insertion probability
+    pd (float): Deletion probability
+    ps (float): Substitution probability
+    q (int): Alphabet size (2 for bits, 4 for A/T/C/G codes)
+    rng: numpy.random.Generator, or a seed for numpy.random.default_rng
+    
+    Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray]: Received sequences zero-padded
+    to the longest one (frames, max length), their lengths (frames,) and the
+    drift after every input symbol (frames, N). For 1-D input the received
+    sequence is returned unpadded and the leading frame axis is dropped.
+    """
+    rng = np.random.default_rng(rng)
+    x = np.asarray(x)
+    single = x.ndim == 1
+    x = np.atleast_2d(x)
+    frames, N = x.shape
+    
+    # Error events of every symbol
+    r = rng.random((frames, N))
+    inserted = r < pi
+    deleted = (r >= pi) & (r < pi + pd)
+    substituted = rng.random((frames, N)) < ps
+    
+    transmitted = np.where(substituted, (x + rng.integers(1, q, size=(frames, N))) % q, x).astype(x.dtype)
+    insertions = rng.integers(0, q, size=(frames, N)).astype(x.dtype)
+    
+    # Every input emits 0, 1 or 2 symbols; the drift follows from their count
+    counts = 1 + inserted.astype(int) - deleted
+    ends = np.cumsum(counts, axis=1)
+    lengths = ends[:, -1] if N else np.zeros(frames, dtype=int)
+    drift = ends - np.arange(1, N + 1)
+    starts = ends - counts
+    
+    y = np.zeros((frames, lengths.max(initial=0)), dtype=x.dtype)
+    rows = np.broadcast_to(np.arange(frames)[:, None], (frames, N))
+    y[rows[inserted], starts[inserted]] = insertions[inserted]
+    kept = ~deleted
+    y[rows[kept], (starts + inserted)[kept]] = transmitted[kept]
+    
+    if single:
+        return y[0, :lengths[0]], lengths[0], drift[0]
+    return y, lengths, drift
@@ -1,73 +1,147 @@
+import os
 import numpy as np
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Callable, NamedTuple, Optional, Tuple
+from ids_channel import simulate_ids_channel
 
 class IDSChannel:
-    def __init__(self, pi: float, pd: float, ps: float):
+    def __init__(self, pi: float, pd: float, ps: float, seed=None):
         self.pi = pi
         self.pd = pd
         self.ps = ps
+        self.rng = np.random.default_rng(seed)
 
     def transmit(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        y = []
-        d = np.zeros(len(x), dtype=int)
-        current_drift = 0
+        y, _, d = simulate_ids_channel(x, self.pi, self.pd, self.ps, rng=self.rng)
+        return y, d
 
-        for i, bit in enumerate(x):
-            r = np.random.random()
-            if r < self.pi:  # Insertion
-                y.append(np.random.randint(2))
-                current_drift += 1
-            elif r < self.pi + self.pd:  # Deletion
-                current_drift -= 1
-                continue
-            
-            # Transmission (with possible substitution)
-            if np.random.random() < self.ps:
-                y.append(1 - bit)
-            else:
-                y.append(bit)
-            
-            d[i] = current_drift
+    def transmit_batch(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Transmit a batch of sequences (frames, N); see simulate_ids_channel."""
+        return simulate_ids_channel(np.atleast_2d(x), self.pi, self.pd, self.ps, rng=self.rng)
 
-        return np.array(y), d
+class CapacityEstimate(NamedTuple):
+    capacity: float      # Running mean of the per-trial mutual information per bit
+    half_width: float    # Half-width of the confidence interval of the mean
+    trials: int          # Number of trials the estimate is based on
+    converged: bool      # Whether the target half-width was reached
 
-def estimate_symmetric_capacity(pi: float, pd: float, ps: float, N: int, M: int) -> float:
+def simulate_capacity_chunk(pi: float, pd: float, ps: float, N: int, trials: int, seed: np.random.SeedSequence) -> Tuple[float, float]:
     """
-    Estimate the symmetric capacity of the IDS channel using Monte Carlo simulation.
+    Run one chunk of Monte Carlo trials with its own random stream.
     
     Args:
     pi (float): Insertion probability
     pd (float): Deletion probability
     ps (float): Substitution probability
     N (int): Length of input sequence
-    M (int): Number of Monte Carlo trials
+    trials (int): Number of trials in the chunk
+    seed (np.random.SeedSequence): Seed of the chunk's random stream
     
     Returns:
-    float: Estimated symmetric capacity
+    Tuple[float, float]: Sum and sum of squares of the per-bit mutual information
     """
-    channel = IDSChannel(pi, pd, ps)
+    rng = np.random.default_rng(seed)
     
-    total_mutual_info = 0
+    # Generate random input sequences and transmit them through the channel
+    x = rng.integers(2, size=(trials, N))
+    y, lengths, d = simulate_ids_channel(x, pi, pd, ps, rng=rng)
     
-    for _ in range(M):
-        # Generate random input sequence
-        x = np.random.randint(2, size=N)
-        
-        # Transmit through the channel
-        y, d = channel.transmit(x)
-        
-        # Calculate mutual information for this trial
-        mutual_info = calculate_mutual_information(x, y, d, pi, pd, ps)
+    values = np.array([calculate_mutual_information(x[t], y[t, :lengths[t]], d[t], pi, pd, ps) for t in range(trials)]) / N
+    return float(values.sum()), float(np.square(values).sum())
+
+def estimate_symmetric_capacity_parallel(pi: float, pd: float, ps: float, N: int, M: int, seed=None, workers: Optional[int] = None,
+                                         chunk_size: int = 100, target_half_width: Optional[float] = None, confidence: float = 0.95,
+                                         progress: Optional[Callable[[CapacityEstimate], None]] = None) -> CapacityEstimate:
+    """
+    Estimate the symmetric capacity with trials spread over a process pool.
+    
+    The M trials are split into chunks of chunk_size, and chunk c always draws
+    from the c-th stream spawned from SeedSequence(seed). Chunks are merged in
+    order, so the estimate and the stopping point only depend on the seed and
+    the chunk size, not on the number of workers.
+    
+    Args:
+    pi (float): Insertion probability
+    pd (float): Deletion probability
+    ps (float): Substitution probability
+    N (int): Length of input sequence
+    M (int): Maximum number of Monte Carlo trials
+    seed: Seed of the root SeedSequence (None for fresh entropy)
+    workers (int): Number of worker processes (default: all cores; 1 runs in-process)
+    chunk_size (int): Number of trials per chunk
+    target_half_width (float): Stop once the confidence interval of the
+    capacity is at most this wide on each side (None runs all M trials)
+    confidence (float): Confidence level of the interval
+    progress (callable): Called with the running estimate after every chunk
+    
+    Returns:
+    CapacityEstimate: Estimated symmetric capacity with its confidence interval
+    """
+    sizes = [min(chunk_size, M - start) for start in range(0, M, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        if executor is None:
+            chunks = (simulate_capacity_chunk(pi, pd, ps, N, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds))
+        else:
+            # Keep a bounded window of chunks in flight so early stopping wastes little work
+            window = 2 * workers
+            futures = [executor.submit(simulate_capacity_chunk, pi, pd, ps, N, size, chunk_seed) for size, chunk_seed in zip(sizes[:window], seeds[:window])]
+
+            def in_order():
+                for c in range(len(sizes)):
+                    if c + window < len(sizes):
+                        futures.append(executor.submit(simulate_capacity_chunk, pi, pd, ps, N, sizes[c + window], seeds[c + window]))
+                    yield futures[c].result()
+                    futures[c] = None
+            
+            chunks = in_order()
         
-        total_mutual_info += mutual_info
+        total = total_squares = 0.0
+        trials = 0
+        estimate = CapacityEstimate(float('nan'), float('inf'), 0, False)
+        for size, (chunk_sum, chunk_squares) in zip(sizes, chunks):
+            total += chunk_sum
+            total_squares += chunk_squares
+            trials += size
+            
+            mean = total / trials
+            variance = max(total_squares - trials * mean ** 2, 0.0) / (trials - 1) if trials > 1 else float('inf')
+            half_width = float(z * np.sqrt(variance / trials))
+            converged = bool(target_half_width is not None and trials > 1 and half_width <= target_half_width)
+            estimate = CapacityEstimate(mean, half_width, trials, converged)
+            
+            if progress is not None:
+                progress(estimate)
+            if converged:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
     
-    # Average mutual information over all trials
-    avg_mutual_info = total_mutual_info / M
+    return estimate
+
+def estimate_symmetric_capacity(pi: float, pd: float, ps: float, N: int, M: int, seed=None, workers: Optional[int] = 1) -> float:
+    """
+    Estimate the symmetric capacity of the IDS channel using Monte Carlo simulation.
     
-    # Symmetric capacity estimation
-    symmetric_capacity = avg_mutual_info / N
+    Args:
+    pi (float): Insertion probability
+    pd (float): Deletion probability
+    ps (float): Substitution probability
+    N (int): Length of input sequence
+    M (int): Number of Monte Carlo trials
+    seed: Seed of the random streams (None for fresh entropy)
+    workers (int): Number of worker processes (None uses all cores)
     
-    return symmetric_capacity
+    Returns:
+    float: Estimated symmetric capacity
+    """
+    return estimate_symmetric_capacity_parallel(pi, pd, ps, N, M, seed=seed, workers=workers).capacity
 
 def calculate_mutual_information(x: np.ndarray, y: np.ndarray, d: np.ndarray, pi: float, pd: float, ps: float) -> float:
     """
@@ -112,9 +186,14 @@ def calculate_mutual_information(x: np.ndarray, y: np.ndarray, d: np.ndarray, pi
     return mutual_info
 
 # Example usage
-pi, pd, ps = 0.1, 0.1, 0.1
-N = 1000
-M = 10000
+if __name__ == "__main__":
+    pi, pd, ps = 0.1, 0.1, 0.1
+    N = 1000
+    M = 10000
 
-estimated_capacity = estimate_symmetric_capacity(pi, pd, ps, N, M)
-print(f"Estimated symmetric capacity: {estimated_capacity}")
+    def report(estimate):
+        print(f"{estimate.trials} trials: {estimate.capacity:.5f} +/- {estimate.half_width:.5f}")
+    
+    estimate = estimate_symmetric_capacity_parallel(pi, pd, ps, N, M, seed=0, workers=None,
+                                                    target_half_width=1e-3, progress=report)
+    print(f"Estimated symmetric capacity: {estimate.capacity}")
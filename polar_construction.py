@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+from functools import lru_cache
+from math import erfc
+from typing import Optional, Sequence
+from drift_trellis import default_max_drift, trellis_llr
+from encoder import polar_transform
+from ids_channel import simulate_ids_channel
+
+# Directory of cached reliabilities, overridden by the environment variable
+CACHE_ENV = 'POLAR_CONSTRUCTION_CACHE'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gc_balanced_polar')
+
+METHODS = ('bhattacharyya', 'ga', 'monte_carlo')
+
+# Serializes computing and storing reliabilities, which threads building
+# decoders at the same time would otherwise do twice
+_cache_lock = threading.Lock()
+
+def effective_crossover(pi: float, pd: float, ps: float) -> float:
+    """
+    Crossover probability of the BSC used as a stand-in for the IDS channel.
+    
+    An insertion or deletion leaves the bit at its position unknown, which
+    a BSC sees as a random bit, so each adds half its probability to ps.
+    """
+    return min(ps + (pi + pd) / 2, 0.5)
+
+def _channel_parameters(N: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]]) -> np.ndarray:
+    """Bhattacharyya parameter of every code bit; positions of B are erased."""
+    p = effective_crossover(pi, pd, ps)
+    z = np.full(N, 2 * np.sqrt(p * (1 - p)))
+    if B is not None and len(B):
+        z[np.asarray(B, dtype=int)] = 1.0
+    return z
+
+def _polarize(values: np.ndarray, left, right) -> np.ndarray:
+    """
+    Combine per-code-bit channel values down the decoding tree.
+    
+    Every node combines the values a of its first half and b of its second
+    half into left(a, b) for its left child and right(a, b) for its right
+    child, matching the f and g functions of the SC decoder.
+    
+    Returns:
+    np.ndarray: Value of the synthetic channel of every u bit
+    """
+    values = np.asarray(values, dtype=float)
+    N = len(values)
+    half = N // 2
+    while half >= 1:
+        blocks = values.reshape(-1, 2, half)
+        a, b = blocks[:, 0], blocks[:, 1]
+        values = np.stack([left(a, b), right(a, b)], axis=1).reshape(N)
+        half //= 2
+    return values
+
+def bhattacharyya_reliabilities(N: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None) -> np.ndarray:
+    """
+    Upper bounds on the error probability of every u bit from Bhattacharyya parameters.
+    
+    Args:
+    N (int): Code length (must be a power of 2)
+    pi (float): Probability of insertion
+    pd (float): Probability of deletion
+    ps (float): Probability of substitution
+    B (list): Codeword positions whose channel LLRs are erased
+    
+    Returns:
+    np.ndarray: Bhattacharyya parameter of every synthetic channel (N,)
+    """
+    z = _channel_parameters(N, pi, pd, ps, B)
+    return _polarize(z, lambda a, b: a + b - a * b, lambda a, b: a * b)
+
+def _phi(x):
+    """Chung's approximation of the GA phi function, decreasing from phi(0) = 1."""
+    x = np.maximum(x, 1e-12)
+    small = np.exp(-0.4527 * x ** 0.86 + 0.0218)
+    large = np.sqrt(np.pi / x) * np.exp(-x / 4) * (1 - 10 / (7 * x))
+    return np.where(x < 10, np.minimum(small, 1.0), large)
+
+def _phi_inverse(y, iterations: int = 60):
+    """Invert phi by bisection, elementwise."""
+    y = np.asarray(y, dtype=float)
+    low, high = np.zeros_like(y), np.full_like(y, 1e4)
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        above = _phi(middle) > y
+        low = np.where(above, middle, low)
+        high = np.where(above, high, middle)
+    return np.where(y >= 1, 0.0, (low + high) / 2)
+
+def ga_reliabilities(N: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None) -> np.ndarray:
+    """
+    Error probability of every u bit under the Gaussian approximation.
+    
+    The effective BSC is replaced by the AWGN channel with the same
+    Bhattacharyya parameter, whose LLRs have mean -4 ln Z; erased positions
+    have mean 0. Means are then combined with the GA recursions.
+    
+    Args:
+    N (int): Code length (must be a power of 2)
+    pi (float): Probability of insertion
+    pd (float): Probability of deletion
+    ps (float): Probability of substitution
+    B (list): Codeword positions whose channel LLRs are erased
+    
+    Returns:
+    np.ndarray: Approximate error probability Q(sqrt(m / 2)) of every synthetic channel (N,)
+    """
+    z = _channel_parameters(N, pi, pd, ps, B)
+    with np.errstate(divide='ignore'):
+        means = np.minimum(-4 * np.log(z), 1e4)
+    means = _polarize(means, lambda a, b: _phi_inverse(1 - (1 - _phi(a)) * (1 - _phi(b))), lambda a, b: a + b)
+    
+    # Q(sqrt(m / 2)) = erfc(sqrt(m) / 2) / 2
+    return 0.5 * np.vectorize(erfc)(np.sqrt(means) / 2)
+
+def genie_aided_errors(channel_llr: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """
+    Decide every u bit from its genie-aided SC LLR.
+    
+    With the true bits known, the partial sums of every node are the polar
+    transform of its true u bits, so the whole decoding tree is evaluated
+    level by level, vectorized over frames and nodes.
+    
+    Args:
+    channel_llr (np.ndarray): Channel LLRs (frames, N)
+    u (np.ndarray): Transmitted u bits (frames, N)
+    
+    Returns:
+    np.ndarray: Error of every bit decision (frames, N), 0.5 for LLR 0
+    """
+    llr = np.asarray(channel_llr, dtype=float)
+    code = polar_transform(u).astype(int)
+    frames, N = llr.shape
+    half = N // 2
+    while half >= 1:
+        blocks = llr.reshape(frames, -1, 2, half)
+        a, b = blocks[:, :, 0], blocks[:, :, 1]
+        code_blocks = code.reshape(frames, -1, 2, half)
+        left_code = code_blocks[:, :, 0] ^ code_blocks[:, :, 1]
+        
+        left = np.sign(a) * np.sign(b) * np.minimum(np.abs(a), np.abs(b))
+        right = b + (1 - 2 * left_code) * a
+        llr = np.stack([left, right], axis=2).reshape(frames, N)
+        code = np.stack([left_code, code_blocks[:, :, 1]], axis=2).reshape(frames, N)
+        half //= 2
+    return np.where(llr == 0, 0.5, (llr < 0) != (u == 1))
+
+def monte_carlo_reliabilities(N: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None, frames: int = 2000,
+                              seed: int = 0, D: Optional[int] = None, chunk_size: int = 100) -> np.ndarray:
+    """
+    Estimate the error probability of every u bit with genie-aided SC decoding.
+    
+    Random codewords are sent through the IDS channel and decoded with the
+    drift trellis LLRs (positions of B erased). Bhattacharyya bounds are
+    added with a tiny weight to order bits that never failed.
+    
+    Args:
+    N (int): Code length (must be a power of 2)
+    pi (float): Probability of insertion
+    pd (float): Probability of deletion
+    ps (float): Probability of substitution
+    B (list): Codeword positions whose channel LLRs are erased
+    frames (int): Number of simulated frames
+    seed (int): Seed of the simulation
+    D (int): Maximum absolute drift of the trellis (default as in the decoder)
+    chunk_size (int): Number of frames simulated at once
+    
+    Returns:
+    np.ndarray: Estimated error probability of every synthetic channel (N,)
+    """
+    rng = np.random.default_rng(seed)
+    D = default_max_drift(N, pi, pd) if D is None else D
+    errors = np.zeros(N)
+    for start in range(0, frames, chunk_size):
+        count = min(chunk_size, frames - start)
+        u = rng.integers(2, size=(count, N))
+        y, lengths, _ = simulate_ids_channel(polar_transform(u), pi, pd, ps, rng=rng)
+        llr, _ = trellis_llr(y, lengths, N, pi, pd, ps, D)
+        if B is not None and len(B):
+            llr[:, np.asarray(B, dtype=int)] = 0
+        errors += genie_aided_errors(llr, u).sum(axis=0)
+    return errors / frames + 1e-9 * bhattacharyya_reliabilities(N, pi, pd, ps, B)
+
+def cache_path(method: str, params: dict) -> str:
+    """File of the cached reliabilities of a construction."""
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    directory = os.environ.get(CACHE_ENV, DEFAULT_CACHE_DIR)
+    return os.path.join(directory, f"{method}-N{params['N']}-{key}.npy")
+
+def _reliabilities(method: str, N: int, pi: float, pd: float, ps: float, B: tuple, frames: int, seed: int, use_cache: bool) -> np.ndarray:
+    with _cache_lock:
+        return _cached_reliabilities(method, N, pi, pd, ps, B, frames, seed, use_cache)
+
+@lru_cache(maxsize=None)
+def _cached_reliabilities(method: str, N: int, pi: float, pd: float, ps: float, B: tuple, frames: int, seed: int, use_cache: bool) -> np.ndarray:
+    if N < 1 or N & (N - 1):
+        raise ValueError("Code length must be a power of 2.")
+    params = dict(N=N, pi=pi, pd=pd, ps=ps, B=list(B))
+    if method == 'monte_carlo':
+        # The drift bound of the trellis is part of the key, so a changed default invalidates old estimates
+        params.update(frames=frames, seed=seed, D=default_max_drift(N, pi, pd))
+    path = cache_path(method, params)
+    if use_cache and os.path.exists(path):
+        return np.load(path)
+    
+    if method == 'bhattacharyya':
+        values = bhattacharyya_reliabilities(N, pi, pd, ps, B)
+    elif method == 'ga':
+        values = ga_reliabilities(N, pi, pd, ps, B)
+    elif method == 'monte_carlo':
+        values = monte_carlo_reliabilities(N, pi, pd, ps, B, frames, seed)
+    else:
+        raise ValueError(f"Unknown construction method {method!r}; expected one of {METHODS}.")
+    
+    if use_cache:
+        # Write to a uniquely named temporary file first so concurrent
+        # writers never share it and readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            np.save(f, values)
+        os.replace(f.name, path)
+    return values
+
+def reliabilities(N: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None, method: str = 'bhattacharyya',
+                  frames: int = 2000, seed: int = 0, use_cache: bool = True) -> np.ndarray:
+    """
+    Error measure of every u bit (lower is more reliable), cached on disk.
+    
+    Results are stored under the directory given by POLAR_CONSTRUCTION_CACHE
+    (default ~/.cache/gc_balanced_polar), in a file named after a hash of the
+    method and its parameters, and memoized in the process.
+    
+    Args:
+    N (int): Code length (must be a power of 2)
+    pi (float): Probability of insertion
+    pd (float): Probability of deletion
+    ps (float): Probability of substitution
+    B (list): Codeword positions whose channel LLRs are erased
+    method (str): 'bhattacharyya', 'ga' or 'monte_carlo'
+    frames (int): Number of simulated frames for 'monte_carlo'
+    seed (int): Seed of the simulation for 'monte_carlo'
+    use_cache (bool): Whether to read and write the disk cache
+    
+    Returns:
+    np.ndarray: Read-only error measure of every synthetic channel (N,)
+    """
+    B = tuple(sorted(int(b) for b in B)) if B is not None else ()
+    values = _reliabilities(method, N, float(pi), float(pd), float(ps), B, frames, seed, use_cache)
+    values.flags.writeable = False
+    return values
+
+def information_set(N: int, K: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None, method: str = 'bhattacharyya', **kwargs) -> np.ndarray:
+    """
+    Positions of the K most reliable u bits, in increasing order.
+    
+    See reliabilities for the arguments.
+    """
+    if not 0 <= K <= N:
+        raise ValueError("K must be between 0 and N.")
+    values = reliabilities(N, pi, pd, ps, B, method, **kwargs)
+    return np.sort(np.argsort(values, kind='stable')[:K])
+
+def frozen_set(N: int, K: int, pi: float, pd: float, ps: float, B: Optional[Sequence[int]] = None, method: str = 'bhattacharyya', **kwargs) -> set:
+    """Positions of the N - K least reliable u bits; see reliabilities for the arguments."""
+    return set(range(N)) - set(information_set(N, K, pi, pd, ps, B, method, **kwargs).tolist())
+
+# Example usage
+if __name__ == "__main__":
+    N, K = 128, 64
+    pi = pd = ps = 0.01
+    B = np.arange(0, N, 16)
+    for method in METHODS:
+        print(method, information_set(N, K, pi, pd, ps, B, method=method))
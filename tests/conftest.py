@@ -0,0 +1,13 @@
+import os
+import sys
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True, scope='session')
+def construction_cache(tmp_path_factory):
+    """Keep the reliabilities cached by polar_construction out of the user's cache."""
+    os.environ['POLAR_CONSTRUCTION_CACHE'] = str(tmp_path_factory.mktemp('construction'))
+    yield
+    os.environ.pop('POLAR_CONSTRUCTION_CACHE', None)
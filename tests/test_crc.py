@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from crc import CRC8_POLYNOMIAL, crc_check, crc_check_batch, crc_compute, crc_remainder
+
+def long_division_remainder(input_bitstring, polynomial_bitstring, initial_filler):
+    """The original string CRC, by long division."""
+    polynomial_bitstring = polynomial_bitstring.lstrip('0')
+    len_input = len(input_bitstring)
+    padded = list(input_bitstring + (len(polynomial_bitstring) - 1) * initial_filler)
+    while '1' in padded[:len_input]:
+        shift = padded.index('1')
+        for i in range(len(polynomial_bitstring)):
+            padded[shift + i] = str(int(polynomial_bitstring[i] != padded[shift + i]))
+    return ''.join(padded)[len_input:]
+
+POLYNOMIALS = ['1011', '111010101', '11000000000000101', '100000100110000010001110110110111']
+
+@pytest.mark.parametrize('polynomial', POLYNOMIALS)
+def test_crc_compute_matches_long_division(polynomial):
+    rng = np.random.default_rng(len(polynomial))
+    for length in (1, 7, 8, 9, 31, 64, 100):
+        bits = rng.integers(0, 2, (6, length))
+        expected = [long_division_remainder(''.join(map(str, row)), polynomial, '0') for row in bits]
+        assert [''.join(map(str, row)) for row in crc_compute(bits, polynomial)] == expected
+        assert [crc_remainder(''.join(map(str, row)), polynomial, '1') for row in bits] == \
+               [long_division_remainder(''.join(map(str, row)), polynomial, '1') for row in bits]
+
+def test_crc_polynomial_as_int():
+    bits = np.random.default_rng(0).integers(0, 2, (4, 40))
+    assert np.array_equal(crc_compute(bits, CRC8_POLYNOMIAL), crc_compute(bits, format(CRC8_POLYNOMIAL, 'b')))
+
+def test_crc_check_accepts_only_the_right_remainder():
+    bits = np.random.default_rng(2).integers(0, 2, (8, 50))
+    message = np.concatenate([bits, crc_compute(bits, CRC8_POLYNOMIAL)], axis=1)
+    assert crc_check_batch(message, CRC8_POLYNOMIAL).all()
+    message[:, 3] ^= 1
+    assert not crc_check_batch(message, CRC8_POLYNOMIAL).any()
+    
+    text, polynomial = ''.join(map(str, bits[0])), format(CRC8_POLYNOMIAL, 'b')
+    assert crc_check(text, polynomial, crc_remainder(text, polynomial, '0'))
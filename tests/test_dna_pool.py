@@ -0,0 +1,40 @@
+import numpy as np
+from dna_pool import PackedPool, iter_fasta, read_fasta, read_fastq, write_fasta, write_fastq
+
+def random_sequences(count, rng):
+    return [''.join(rng.choice(list('ACGT'), length)) for length in rng.integers(0, 40, count)]
+
+def test_pool_round_trips_sequences_and_codes():
+    rng = np.random.default_rng(0)
+    sequences = random_sequences(50, rng)
+    pool = PackedPool.from_sequences(sequences)
+    assert len(pool) == 50
+    assert [pool.sequence(i) for i in range(len(pool))] == sequences
+    
+    codes, lengths = pool.codes(5, 20)
+    again = PackedPool.from_codes(codes, lengths)
+    assert [again.sequence(i) for i in range(len(again))] == sequences[5:20]
+
+def test_pool_round_trips_fasta_and_fastq(tmp_path):
+    rng = np.random.default_rng(1)
+    sequences = random_sequences(30, rng)
+    names = [f'read_{i}' for i in range(30)]
+    pool = PackedPool.from_sequences(sequences, names)
+    
+    write_fasta(str(tmp_path / 'reads.fasta'), pool, chunk_records=7)
+    fasta = read_fasta(str(tmp_path / 'reads.fasta'), keep_names=True)
+    assert fasta.names == names
+    assert [fasta.sequence(i) for i in range(len(fasta))] == sequences
+    
+    write_fastq(str(tmp_path / 'reads.fastq'), pool)
+    fastq = read_fastq(str(tmp_path / 'reads.fastq'))
+    assert [fastq.sequence(i) for i in range(len(fastq))] == sequences
+
+def test_fasta_blocks_split_on_record_boundaries(tmp_path):
+    rng = np.random.default_rng(2)
+    sequences = random_sequences(40, rng)
+    write_fasta(str(tmp_path / 'reads.fasta'), PackedPool.from_sequences(sequences))
+    pools = list(iter_fasta(str(tmp_path / 'reads.fasta'), chunk_bytes=64))
+    assert len(pools) > 1
+    joined = PackedPool.concatenate(pools)
+    assert [joined.sequence(i) for i in range(len(joined))] == sequences
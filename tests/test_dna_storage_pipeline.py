@@ -0,0 +1,23 @@
+import os
+import numpy as np
+from batch_decoder import decode_pool, restore_file
+from dna_pool import read_fasta
+from dna_storage_pipeline import DNAStoragePipeline
+
+ARGS = dict(N=128, K=64, L=4)
+
+def test_file_round_trip(tmp_path):
+    data = os.urandom(300)
+    (tmp_path / 'in.bin').write_bytes(data)
+    pipeline = DNAStoragePipeline(**ARGS)
+    pipeline.encode_file(str(tmp_path / 'in.bin'), str(tmp_path / 'strands.fasta'))
+    
+    telemetry = pipeline.decoder.enable_telemetry()
+    pipeline.decode_file(str(tmp_path / 'strands.fasta'), str(tmp_path / 'out.bin'))
+    assert (tmp_path / 'out.bin').read_bytes() == data
+    assert telemetry.calls['channel'] > 0 and telemetry.drift_histograms
+    
+    bits, summary = decode_pool(read_fasta(str(tmp_path / 'strands.fasta')), ARGS, workers=1, chunk_strands=5)
+    assert summary['crc_failures'] == 0
+    assert restore_file(bits, str(tmp_path / 'pool.bin')) == len(data)
+    assert (tmp_path / 'pool.bin').read_bytes() == data
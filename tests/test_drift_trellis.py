@@ -0,0 +1,64 @@
+import itertools
+import numpy as np
+import pytest
+from drift_trellis import trellis_llr
+from drift_vector import build_transition_matrix, drift_priors
+
+PI, PD, PS = 0.1, 0.15, 0.05
+
+def likelihood(x, y):
+    """
+    P(y | x) of the channel of trellis_llr, summed over all error patterns.
+    
+    Every bit of x is deleted, transmitted, or preceded by a random inserted bit.
+    """
+    def emit(j, bit):
+        return 1 - PS if y[j] == bit else PS
+    
+    # f[i, j] = P(y[j:] | x[i:])
+    f = np.zeros((len(x) + 1, len(y) + 2))
+    f[len(x), len(y)] = 1.0
+    for i in range(len(x) - 1, -1, -1):
+        for j in range(len(y) + 1):
+            f[i, j] = PD * f[i + 1, j]
+            if j < len(y):
+                f[i, j] += (1 - PI - PD) * emit(j, x[i]) * f[i + 1, j + 1]
+            if j + 1 < len(y):
+                f[i, j] += PI * 0.5 * emit(j + 1, x[i]) * f[i + 1, j + 2]
+    return f[0, 0]
+
+def brute_force_llr(y, N):
+    """Bit LLRs of uniform inputs from P(y | x) over all 2^N inputs."""
+    words = np.array(list(itertools.product((0, 1), repeat=N)))
+    p = np.array([likelihood(x, y) for x in words])
+    return np.log(np.array([p[words[:, i] == 0].sum() / p[words[:, i] == 1].sum() for i in range(N)]))
+
+@pytest.mark.parametrize('beam', [None, 1e3])
+def test_trellis_matches_brute_force(beam):
+    N = 6
+    rng = np.random.default_rng(3)
+    reads = [rng.integers(0, 2, length) for length in (4, 5, 6, 6, 7, 8)]
+    y = np.zeros((len(reads), max(map(len, reads))), dtype=int)
+    for f, read in enumerate(reads):
+        y[f, :len(read)] = read
+    lengths = np.array([len(read) for read in reads])
+    
+    llr, _ = trellis_llr(y, lengths, N, PI, PD, PS, N, beam)
+    expected = np.array([brute_force_llr(read, N) for read in reads])
+    assert np.allclose(llr, expected, atol=1e-9)
+
+def test_trellis_chunks_do_not_change_the_result():
+    rng = np.random.default_rng(4)
+    y = rng.integers(0, 2, (7, 34))
+    lengths = rng.integers(28, 35, 7)
+    whole, drift = trellis_llr(y, lengths, 32, 0.02, 0.02, 0.02, 6)
+    chunked, chunked_drift = trellis_llr(y, lengths, 32, 0.02, 0.02, 0.02, 6, max_frames=2)
+    assert np.array_equal(whole, chunked) and np.array_equal(drift, chunked_drift)
+
+def test_drift_priors_match_matrix_powers():
+    D, p_i, p_d = 4, 0.2, 0.1
+    priors, stationary = drift_priors(20, D, p_i, p_d)
+    P = build_transition_matrix(D, p_i, p_d)
+    for i in (0, 1, 7, 20):
+        assert np.allclose(priors[i], np.linalg.matrix_power(P, i)[D])
+    assert np.allclose(stationary @ P, stationary)
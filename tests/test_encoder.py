@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from encoder import (find_balanced_vector, find_balanced_vector_greedy, find_balanced_vectors, polar_encode,
+                     polar_transform, polar_transform_matrix)
+
+@pytest.mark.parametrize('n', range(1, 9))
+def test_polar_transform_matches_matrix(n):
+    rng = np.random.default_rng(n)
+    u = rng.integers(0, 2, (16, 2**n))
+    expected = polar_encode(u, polar_transform_matrix(n))
+    assert np.array_equal(polar_transform(u), expected)
+    assert np.array_equal(polar_transform(u[0]), expected[0])
+
+def test_polar_transform_is_an_involution():
+    u = np.random.default_rng(0).integers(0, 2, (8, 64))
+    assert np.array_equal(polar_transform(polar_transform(u)), u)
+
+def test_balanced_vectors_reach_the_best_weight():
+    rng = np.random.default_rng(1)
+    c = rng.integers(0, 2, (64, 32))
+    B = [1, 4, 9, 17, 30]
+    b, imbalance = find_balanced_vectors(c, B)
+    assert not b[:, np.setdiff1d(np.arange(32), B)].any()
+    
+    # Exhaustive search over all 2^|B| flip vectors
+    flips = (np.arange(2**len(B))[:, None] >> np.arange(len(B))) & 1
+    weights = c.sum(axis=1)[:, None] + np.where(c[:, B][:, None], -flips, flips).sum(axis=-1)
+    assert np.array_equal(imbalance, np.abs(weights - 16).min(axis=1))
+    assert np.array_equal(np.abs((c ^ b).sum(axis=1) - 16), imbalance)
+
+def test_greedy_balancer_is_a_deprecated_wrapper():
+    c = np.zeros(8, dtype=int)
+    with pytest.warns(DeprecationWarning):
+        b = find_balanced_vector_greedy(c, [1, 2, 3, 5])
+    assert np.array_equal(b, find_balanced_vector(c, [1, 2, 3, 5]))
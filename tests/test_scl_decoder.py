@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from SCLDecoder import SCLDecoder
+from crc import CRC8_POLYNOMIAL, crc_compute
+from encoder import polar_transform
+
+def noisy_llr(decoder, frames, sigma, rng):
+    """BPSK LLRs over an AWGN channel of random messages (with their CRC, if any)."""
+    message = rng.integers(0, 2, (frames, decoder.K))
+    if decoder.crc_polynomial is not None:
+        message[:, -8:] = crc_compute(message[:, :-8], decoder.crc_polynomial)
+    u = np.zeros((frames, decoder.N), dtype=np.uint8)
+    u[:, decoder.info_positions] = message
+    x = polar_transform(u)
+    y = 1 - 2.0 * x + sigma * rng.standard_normal(x.shape)
+    return 2 * y / sigma**2, message
+
+def decoder_pair(N, K, L, crc=None):
+    fast = SCLDecoder(N, K, L, crc_polynomial=crc)
+    return fast, SCLDecoder(N, K, L, crc_polynomial=crc, frozen_bits=sorted(fast.frozen_bits), fast_ssc=False)
+
+@pytest.mark.parametrize('N, K', [(16, 8), (64, 32), (256, 128)])
+def test_fast_ssc_matches_bit_by_bit_sc_decoding(N, K):
+    fast, reference = decoder_pair(N, K, 1)
+    llr, _ = noisy_llr(fast, 200, 0.9, np.random.default_rng(N))
+    assert np.array_equal(fast.decode_llr_batch(llr), reference.decode_llr_batch(llr))
+
+@pytest.mark.parametrize('N, K, L, crc', [(64, 32, 4, None), (128, 72, 8, CRC8_POLYNOMIAL), (256, 96, 16, None)])
+def test_fast_ssc_list_decoding_against_bit_by_bit(N, K, L, crc):
+    fast, reference = decoder_pair(N, K, L, crc)
+    rng = np.random.default_rng(N + L)
+    
+    # Special nodes score whole subtrees from their node LLRs and fork a
+    # bounded number of times, so list decoding only agrees with the
+    # reference while the channel is good, and otherwise errs about as often
+    llr, _ = noisy_llr(fast, 200, 0.6, rng)
+    assert np.array_equal(fast.decode_llr_batch(llr), reference.decode_llr_batch(llr))
+    if crc is not None:
+        assert np.array_equal(fast.crc_passed, reference.crc_passed)
+    
+    llr, message = noisy_llr(fast, 400, 0.9, rng)
+    fast_errors = (fast.decode_llr_batch(llr) != message).any(axis=1).sum()
+    reference_errors = (reference.decode_llr_batch(llr) != message).any(axis=1).sum()
+    assert fast_errors <= reference_errors + 8
+
+def test_decoder_recovers_clean_messages():
+    decoder = SCLDecoder(64, 32, 4)
+    llr, message = noisy_llr(decoder, 10, 0.3, np.random.default_rng(0))
+    assert np.array_equal(decoder.decode_llr_batch(llr), message)
+
+def test_pool_is_reused_for_smaller_batches():
+    decoder = SCLDecoder(32, 16, 4)
+    rng = np.random.default_rng(1)
+    first = decoder.decode_llr_batch(noisy_llr(decoder, 8, 0.8, rng)[0])
+    pool = decoder.pools[4]
+    llr, _ = noisy_llr(decoder, 3, 0.8, rng)
+    assert np.array_equal(decoder.decode_llr_batch(llr), SCLDecoder(32, 16, 4).decode_llr_batch(llr))
+    assert decoder.pools[4] is pool and len(first) == 8
+
+def test_path_memory_counts_the_allocated_pool():
+    decoder = SCLDecoder(64, 32, 8)
+    pool = decoder.allocate_pool(5)
+    arrays = [array for name, value in pool.items() if name != 'capacity' for array in (value if isinstance(value, list) else [value])]
+    tables = 5 * 8 * (8 + (2 * decoder.n + 1) * np.dtype(np.intp).itemsize)
+    assert decoder.path_memory(5) == sum(array.nbytes for array in arrays) + tables